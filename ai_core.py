@@ -1,10 +1,9 @@
 # modules/ai_core.py - UPDATED FOR OPENAI v1.0.0+
-import openai
 import json
 import os
 import random
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI  # New import for v1.0.0+
 
 # STEP 1: Load environment variables from .env file
 load_dotenv()
@@ -25,15 +24,25 @@ MODEL_CONFIG = {
 class StudentAIAssistant:
     def __init__(self):
         self.openai_api_key = OPENAI_API_KEY
+        self._client = None
+        self._client_lock = threading.Lock()
         if self.openai_api_key:
-            # Initialize the OpenAI client for v1.0.0+
-            self.client = OpenAI(api_key=self.openai_api_key)
+            # The OpenAI client (and the SDK import) is created on first use
             self.use_openai = True
         else:
-            self.client = None
             self.use_openai = False
             print("⚠️ OpenAI API key not found. Using mock responses.")
     
+    @property
+    def client(self):
+        """OpenAI v1.0.0+ client, built on first use"""
+        if self._client is None and self.use_openai:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self.openai_api_key)
+        return self._client
+    
     def ask_question(self, question, subject=None):
         """Main method to answer student questions"""
         
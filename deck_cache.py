@@ -0,0 +1,103 @@
+# modules/deck_cache.py
+import threading
+from collections import Counter
+
+from modules.session_decks import SharedDeckCache
+
+
+class DeckDataCache:
+    """Deck listings, deck contents and deck stats for the web pages.
+
+    Streamlit reruns the script on every click, so these are computed once
+    and kept until the FlashcardSystem reports a save, delete or import.
+    """
+
+    def __init__(self, flashcard_sys, max_decks=32, max_bytes=64 * 1024 * 1024):
+        self.flashcard_sys = flashcard_sys
+        self.decks = SharedDeckCache(flashcard_sys.read_set, max_decks, max_bytes)
+
+        self._lock = threading.Lock()
+        self._listing = None
+        self._stats = None
+        # Bumped on every write so a result computed across a write is not kept
+        self._version = 0
+        self._hits = Counter()
+        self._misses = Counter()
+        self.invalidations = 0
+
+        flashcard_sys.add_write_listener(self._on_write)
+
+    def list_sets(self):
+        """Saved sets, newest first (shared; do not modify)"""
+        with self._lock:
+            if self._listing is not None:
+                self._hits["listing"] += 1
+                return self._listing
+            self._misses["listing"] += 1
+            version = self._version
+
+        listing = self.flashcard_sys.list_saved_sets()
+        with self._lock:
+            if version == self._version:
+                self._listing = listing
+        return listing
+
+    def get_deck(self, filename):
+        return self.decks.get(filename)
+
+    def get_deck_stats(self):
+        """Set and card totals plus card counts per topic"""
+        with self._lock:
+            if self._stats is not None:
+                self._hits["stats"] += 1
+                return self._stats
+            self._misses["stats"] += 1
+            version = self._version
+
+        sets = self.list_sets()
+        topics = Counter()
+        for s in sets:
+            topics[s['topic']] += s['count']
+        stats = {
+            "sets": len(sets),
+            "cards": sum(s['count'] for s in sets),
+            "topics": dict(topics.most_common()),
+        }
+        with self._lock:
+            if version == self._version:
+                self._stats = stats
+        return stats
+
+    def invalidate(self, filename=None):
+        with self._lock:
+            self._version += 1
+            self._listing = None
+            self._stats = None
+            self.invalidations += 1
+        self.decks.invalidate(filename)
+
+    def get_stats(self):
+        """Hit rates of each cached view"""
+        with self._lock:
+            views = {}
+            for name in ("listing", "stats"):
+                lookups = self._hits[name] + self._misses[name]
+                views[name] = {
+                    "hits": self._hits[name],
+                    "misses": self._misses[name],
+                    "hit_rate": self._hits[name] / lookups if lookups else 0.0,
+                }
+            invalidations = self.invalidations
+        deck_stats = self.decks.get_stats()
+        views["decks"] = {key: deck_stats[key] for key in ("hits", "misses", "hit_rate")}
+        return {
+            "views": views,
+            "invalidations": invalidations,
+            "cached_decks": deck_stats["decks"],
+            "cached_bytes": deck_stats["bytes"],
+            "evictions": deck_stats["evictions"],
+        }
+
+    def _on_write(self, event, filename):
+        # A save or import may replace a set with the same name, so drop its contents too
+        self.invalidate(filename)
@@ -0,0 +1,236 @@
+# modules/deck_search.py
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+SEARCH_DB = DATA_DIR / "cache" / "deck_search.db"
+
+
+def set_version(saved_set):
+    """What identifies one version of a saved set: its card count and modification time"""
+    return f"{saved_set['count']}:{saved_set.get('modified')}"
+
+
+class DeckSearchIndex:
+    """Full-text index (SQLite FTS5, BM25 ranking) over the cards of every saved set.
+
+    Card text lives in search_cards; the FTS table is an external-content
+    index over it, so replacing or dropping one set only touches that set's
+    rows (found through the filename index) instead of the whole index.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS search_cards (
+            rowid INTEGER PRIMARY KEY,
+            filename TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            card_id TEXT,
+            question TEXT,
+            answer TEXT,
+            category TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_search_cards_filename ON search_cards(filename);
+        CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+            question, answer, category,
+            content='search_cards', content_rowid='rowid',
+            tokenize='porter unicode61'
+        );
+        CREATE TABLE IF NOT EXISTS indexed_sets (
+            filename TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            version TEXT
+        );
+    """
+    # BM25 column weights: question, answer, category
+    WEIGHTS = (3.0, 1.0, 2.0)
+    BATCH_SIZE = 1000
+
+    def __init__(self, db_path=SEARCH_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(indexed_sets)")}
+        if columns and "version" not in columns:
+            self._conn.execute("ALTER TABLE indexed_sets ADD COLUMN version TEXT")
+        try:
+            self._conn.executescript(self.SCHEMA)
+            self.available = True
+        except sqlite3.OperationalError as e:
+            # Python builds whose SQLite lacks FTS5
+            print(f"⚠️  Flashcard search disabled: {e}")
+            self.available = False
+
+    def index_set(self, filename, cards, version=None):
+        """(Re)index one set; cards may be any iterable, e.g. a lazy deck.
+
+        version (see set_version) lets sync() skip the set until it changes.
+        """
+        if not self.available:
+            return 0
+        with self._lock, self._conn:
+            self._remove(filename)
+            count = 0
+            batch = []
+            for position, card in enumerate(cards):
+                card_id = card.get('id')
+                batch.append((filename, position, None if card_id is None else str(card_id),
+                              card.get('question'), card.get('answer'), card.get('category')))
+                if len(batch) >= self.BATCH_SIZE:
+                    count += self._insert(batch)
+                    batch = []
+            count += self._insert(batch)
+            self._conn.execute(
+                "INSERT INTO cards_fts (rowid, question, answer, category) "
+                "SELECT rowid, question, answer, category FROM search_cards WHERE filename = ?",
+                (filename,)
+            )
+            self._conn.execute("INSERT OR REPLACE INTO indexed_sets VALUES (?, ?, ?)", (filename, count, version))
+        return count
+
+    def remove_set(self, filename):
+        if not self.available:
+            return
+        with self._lock, self._conn:
+            self._remove(filename)
+
+    def indexed_sets(self):
+        """{filename: version indexed} for every set in the index"""
+        if not self.available:
+            return {}
+        with self._lock:
+            return {row['filename']: row['version'] for row in self._conn.execute("SELECT * FROM indexed_sets")}
+
+    def sync(self, saved_sets, load_cards):
+        """Index saved sets that are new or changed since indexed, and drop sets that are gone"""
+        if not self.available:
+            return 0
+        indexed = self.indexed_sets()
+        saved = {s['filename']: set_version(s) for s in saved_sets}
+        for filename in set(indexed) - set(saved):
+            self.remove_set(filename)
+
+        added = 0
+        for filename, version in saved.items():
+            if indexed.get(filename) != version:
+                cards = load_cards(filename)
+                if cards is not None:
+                    self.index_set(filename, cards, version)
+                    added += 1
+        return added
+
+    def search(self, query, limit=20):
+        """Ranked hits for a free-text query.
+
+        Every word must match; the last one also matches as a prefix (when it
+        has 3+ letters) so results appear while the student is still typing.
+        """
+        terms = re.findall(r"\w+", query.lower())
+        if not terms or not self.available:
+            return []
+        match = " ".join(f'"{term}"' for term in terms)
+        if len(terms[-1]) >= 3:
+            match += "*"
+
+        # Rank inside the FTS index first; card text is fetched only for the top hits
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.filename, c.position, c.card_id, c.question, c.answer, c.category, hits.rank "
+                "FROM (SELECT rowid, bm25(cards_fts, ?, ?, ?) AS rank FROM cards_fts "
+                "      WHERE cards_fts MATCH ? ORDER BY rank LIMIT ?) AS hits "
+                "JOIN search_cards AS c ON c.rowid = hits.rowid ORDER BY hits.rank",
+                (*self.WEIGHTS, match, limit)
+            ).fetchall()
+        return [
+            {
+                'filename': row['filename'],
+                'position': row['position'],
+                'id': row['card_id'],
+                'question': row['question'],
+                'answer': row['answer'],
+                'category': row['category'],
+                'score': -row['rank'],
+            }
+            for row in rows
+        ]
+
+    def get_stats(self):
+        if not self.available:
+            return {"sets": 0, "cards": 0}
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) AS sets, COALESCE(SUM(count), 0) AS cards FROM indexed_sets").fetchone()
+        return {"sets": row['sets'], "cards": row['cards']}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, batch):
+        if not batch:
+            return 0
+        self._conn.executemany(
+            "INSERT INTO search_cards (filename, position, card_id, question, answer, category) "
+            "VALUES (?, ?, ?, ?, ?, ?)", batch
+        )
+        return len(batch)
+
+    def _remove(self, filename):
+        # External-content FTS rows are removed with the 'delete' command and their old values
+        self._conn.execute(
+            "INSERT INTO cards_fts (cards_fts, rowid, question, answer, category) "
+            "SELECT 'delete', rowid, question, answer, category FROM search_cards WHERE filename = ?",
+            (filename,)
+        )
+        self._conn.execute("DELETE FROM search_cards WHERE filename = ?", (filename,))
+        self._conn.execute("DELETE FROM indexed_sets WHERE filename = ?", (filename,))
+
+
+# Tests
+def test_sync_reindexes_only_changed_sets():
+    """A same-count edit is reindexed on the next sync; an unchanged set is skipped"""
+    import tempfile
+    import time
+    from modules.deck_store import JSONDeckStore, SQLiteDeckStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = DeckSearchIndex(Path(directory) / "search.db")
+        stores = (JSONDeckStore(Path(directory) / "json", compact_interval=3600),
+                  SQLiteDeckStore(Path(directory) / "flashcards.db"))
+        for store in stores:
+            store.save_set("cells.json", "Biology", [{"id": 1, "question": "What is a cell?",
+                                                     "answer": "The unit of life", "category": "Biology"}])
+            store.save_set("atoms.json", "Chemistry", [{"id": 1, "question": "What is an atom?",
+                                                       "answer": "The unit of matter", "category": "Chemistry"}])
+            assert index.sync(store.list_sets(), store.open_deck) == 2
+            assert index.sync(store.list_sets(), store.open_deck) == 0, "unchanged sets were reindexed"
+
+            # Same card count, new text
+            time.sleep(0.01)
+            store.save_set("cells.json", "Biology", [{"id": 1, "question": "What is a ribosome?",
+                                                     "answer": "Where proteins are made", "category": "Biology"}])
+            assert index.sync(store.list_sets(), store.open_deck) == 1
+            assert [hit["question"] for hit in index.search("ribosome")] == ["What is a ribosome?"]
+            assert not index.search("cell")
+
+            # A set indexed on save records the version sync() compares against
+            store.save_set("atoms.json", "Chemistry", [{"id": 1, "question": "What is an ion?",
+                                                       "answer": "A charged atom", "category": "Chemistry"}])
+            index.index_set("atoms.json", store.open_deck("atoms.json"), set_version(store.set_info("atoms.json")))
+            assert index.sync(store.list_sets(), store.open_deck) == 0
+
+            for name in ("cells.json", "atoms.json"):
+                index.remove_set(name)
+            store.close()
+        index.close()
+        print("✅ Search index resyncs edited sets and skips unchanged ones")
+
+
+if __name__ == "__main__":
+    test_sync_reindexes_only_changed_sets()
@@ -0,0 +1,730 @@
+# modules/deck_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+from modules.deck_log import DeckLog, fsync_paths, write_atomic
+from modules.lazy_deck import JSONLDeck, iter_cards, write_jsonl_deck
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+FLASHCARDS_DIR = DATA_DIR / "flashcards"
+FLASHCARDS_DB = DATA_DIR / "flashcards.db"
+
+CARD_FIELDS = ("id", "question", "answer", "difficulty", "category", "created")
+CARD_COLUMNS = "card_id AS id, question, answer, difficulty, category, created"
+IMPORT_BATCH_SIZE = 1000
+
+
+class JSONDeckStore:
+    """One JSON file per flashcard set in data/flashcards (the original format).
+
+    Set metadata is kept in a manifest next to the decks, so listing reads
+    one file; decks changed out-of-band are detected by size/mtime from the
+    directory listing and only those are re-parsed.
+
+    With durable=True every save/delete is first appended to a write-ahead
+    log (group-committed fsync), then the deck file is replaced atomically.
+    A background compactor fsyncs the deck files and empties the log; on
+    startup the log is replayed to redo writes a crash interrupted.
+    """
+
+    MANIFEST_NAME = ".manifest"
+    LOG_NAME = ".deck_log"
+
+    def __init__(self, directory=FLASHCARDS_DIR, durable=True,
+                 compact_interval=30.0, compact_bytes=4 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.directory / self.MANIFEST_NAME
+        self.compact_interval = compact_interval
+        self.compact_bytes = compact_bytes
+
+        self._lock = threading.RLock()
+        self._manifest = None
+        self._manifest_mtime = None
+
+        # Writers in flight vs. a running compaction (which must see none)
+        self._write_cond = threading.Condition()
+        self._inflight = 0
+        self._compacting = False
+        self._dirty = set()
+        self._applied = {}
+
+        self.log = None
+        if durable:
+            self.log = DeckLog(self.directory / self.LOG_NAME)
+            self._recover()
+            self._closed = False
+            self._compact_wakeup = threading.Event()
+            self._compactor = threading.Thread(target=self._compact_loop, name="deck-log-compactor", daemon=True)
+            self._compactor.start()
+
+    def save_set(self, filename, topic, flashcards):
+        cards = [dict(card) for card in flashcards]
+        with self._writing():
+            seq = self.log.append({"op": "save", "filename": filename, "cards": cards}) if self.log else 0
+            self._apply_save(filename, cards, seq)
+        self._maybe_compact()
+        return self.directory / filename
+
+    def load_set(self, filename):
+        filepath = self.directory / filename
+        if not os.path.exists(filepath):
+            return None
+        if filename.endswith('.jsonl'):
+            return list(iter_cards(filepath))
+        with open(filepath, 'r') as f:
+            return json.load(f)
+
+    def open_deck(self, filename):
+        """Open a set for lazy, paged access (large sets are stored as .jsonl)"""
+        filepath = self.directory / filename
+        if not os.path.exists(filepath):
+            return None
+        if filename.endswith('.jsonl'):
+            return JSONLDeck(filepath)
+        return self.load_set(filename)
+
+    def import_deck(self, source, filename, topic=None):
+        """Stream a .json/.jsonl file into a .jsonl deck without loading it whole.
+
+        Imports bypass the log (they can be huge); the deck is still renamed
+        into place atomically and fsynced by the next compaction.
+        """
+        filename = filename.rsplit('.', 1)[0] + '.jsonl'
+        filepath = self.directory / filename
+        with self._writing(), self._lock:
+            count, first = write_jsonl_deck(filepath, iter_cards(source))
+            self._dirty.update((filename, f"{filename}.idx"))
+            manifest = self._load_manifest()
+            manifest[filename] = self._entry(filepath, [first] if first else [])
+            manifest[filename]['count'] = count
+            if topic:
+                manifest[filename]['topic'] = topic
+            self._write_manifest(manifest)
+        return filename, count
+
+    def latest_set(self):
+        manifest = {name: entry for name, entry in self._reconciled().items() if entry['count']}
+        if not manifest:
+            return None
+        return max(manifest, key=lambda name: manifest[name]['mtime'])
+
+    def list_sets(self):
+        flashcard_files = [
+            {
+                'filename': filename,
+                'count': entry['count'],
+                'topic': entry['topic'],
+                'created': entry['created'],
+                'size': entry['size'],
+                'modified': entry['mtime'],
+                'path': str(self.directory / filename)
+            }
+            for filename, entry in self._reconciled().items()
+            if entry['count']
+        ]
+
+        # Sort by creation date (newest first)
+        flashcard_files.sort(key=lambda x: x.get('created', ''), reverse=True)
+        return flashcard_files
+
+    def set_info(self, filename):
+        """One set's list_sets() entry from the manifest, without rescanning the directory"""
+        with self._lock:
+            entry = self._load_manifest().get(filename)
+        if entry is None:
+            return None
+        return {
+            'filename': filename,
+            'count': entry['count'],
+            'topic': entry['topic'],
+            'created': entry['created'],
+            'size': entry['size'],
+            'modified': entry['mtime'],
+            'path': str(self.directory / filename)
+        }
+
+    def delete_set(self, filename):
+        if not os.path.exists(self.directory / filename):
+            return False
+        with self._writing():
+            seq = self.log.append({"op": "delete", "filename": filename}) if self.log else 0
+            self._apply_delete(filename, seq)
+        self._maybe_compact()
+        return True
+
+    def compact(self):
+        """Make every deck file durable, then empty the write-ahead log"""
+        if self.log is None:
+            return
+        with self._write_cond:
+            while self._compacting:
+                self._write_cond.wait()
+            self._compacting = True
+            while self._inflight:
+                self._write_cond.wait()
+        try:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                self._applied.clear()
+            try:
+                fsync_paths([self.directory / name for name in dirty], self.directory)
+                self.log.truncate()
+            except OSError:
+                with self._lock:
+                    self._dirty |= dirty
+                raise
+        finally:
+            with self._write_cond:
+                self._compacting = False
+                self._write_cond.notify_all()
+
+    def close(self):
+        if self.log is None:
+            return
+        self._closed = True
+        self._compact_wakeup.set()
+        self._compactor.join()
+        self.compact()
+        self.log.close()
+
+    @contextmanager
+    def _writing(self):
+        """Register a write so compaction waits for it (and it waits for compaction)"""
+        with self._write_cond:
+            while self._compacting:
+                self._write_cond.wait()
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._write_cond:
+                self._inflight -= 1
+                if not self._inflight:
+                    self._write_cond.notify_all()
+
+    def _apply_save(self, filename, cards, seq):
+        filepath = self.directory / filename
+        with self._lock:
+            # Two writers of one set: the later log record wins, whoever gets here first
+            if seq and seq < self._applied.get(filename, 0):
+                return
+            write_atomic(filepath, json.dumps(cards, indent=2).encode('utf-8'))
+            self._applied[filename] = seq
+            self._dirty.add(filename)
+            manifest = self._load_manifest()
+            manifest[filename] = self._entry(filepath, cards)
+            self._write_manifest(manifest)
+
+    def _apply_delete(self, filename, seq):
+        filepath = self.directory / filename
+        with self._lock:
+            if seq and seq < self._applied.get(filename, 0):
+                return
+            for path in (filepath, f"{filepath}.idx"):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._applied[filename] = seq
+            self._dirty.add(filename)
+            manifest = self._load_manifest()
+            if manifest.pop(filename, None) is not None:
+                self._write_manifest(manifest)
+
+    def _recover(self):
+        """Redo logged writes a crash may have cut short, then start a fresh log"""
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                os.remove(self.directory / name)  # Half-written snapshot; the log has the data
+
+        records = self.log.replay()
+        for record in records:
+            if record.get("op") == "save":
+                self._apply_save(record["filename"], record["cards"], 0)
+            elif record.get("op") == "delete":
+                self._apply_delete(record["filename"], 0)
+        if records:
+            print(f"🔁 Replayed {len(records)} logged flashcard writes")
+            self.compact()
+
+    def _maybe_compact(self):
+        if self.log is not None and self.log.size() > self.compact_bytes:
+            self._compact_wakeup.set()
+
+    def _compact_loop(self):
+        while not self._closed:
+            self._compact_wakeup.wait(self.compact_interval)
+            self._compact_wakeup.clear()
+            if self._closed:
+                break
+            if self.log.size():
+                try:
+                    self.compact()
+                except OSError as e:
+                    print(f"⚠️  Flashcard log compaction failed: {e}")
+
+    def _reconciled(self):
+        """Return the manifest after syncing it with the directory listing"""
+        with self._lock:
+            manifest = self._load_manifest()
+            changed = False
+            seen = set()
+
+            for dir_entry in os.scandir(self.directory):
+                if not dir_entry.name.endswith(('.json', '.jsonl')) or not dir_entry.is_file():
+                    continue
+                seen.add(dir_entry.name)
+                stat = dir_entry.stat()
+                known = manifest.get(dir_entry.name)
+                if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+                    continue
+
+                # New or changed out-of-band: parse just this file
+                count = None
+                try:
+                    if dir_entry.name.endswith('.jsonl'):
+                        deck = JSONLDeck(dir_entry.path)
+                        count = len(deck)
+                        data = deck[:1]
+                        deck.close()
+                    else:
+                        with open(dir_entry.path, 'r') as f:
+                            data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  Skipping unreadable flashcard set {dir_entry.name}: {e}")
+                    data = []
+                if not isinstance(data, list):
+                    data = []
+                manifest[dir_entry.name] = self._entry(Path(dir_entry.path), data, stat)
+                if count is not None:
+                    manifest[dir_entry.name]['count'] = count
+                changed = True
+
+            for filename in set(manifest) - seen:
+                del manifest[filename]
+                changed = True
+
+            if changed:
+                self._write_manifest(manifest)
+            return dict(manifest)
+
+    @staticmethod
+    def _entry(filepath, flashcards, stat=None):
+        stat = stat or os.stat(filepath)
+        first = flashcards[0] if flashcards else {}
+        return {
+            'topic': first.get('category', 'Unknown'),
+            'count': len(flashcards),
+            'created': first.get('created', 'Unknown'),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime
+        }
+
+    def _load_manifest(self):
+        """Read the manifest, reusing the in-memory copy unless the file changed"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if self._manifest is None or mtime != self._manifest_mtime:
+            self._manifest = {}
+            if mtime is not None:
+                try:
+                    with open(self.manifest_path, 'r') as f:
+                        self._manifest = json.load(f).get('sets', {})
+                except (OSError, ValueError):
+                    self._manifest = {}
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': 1, 'sets': manifest}, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest = manifest
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+
+
+class SQLiteDeckStore:
+    """Flashcard sets and cards in an embedded SQLite database with indexed lookups"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sets (
+            id INTEGER PRIMARY KEY,
+            filename TEXT NOT NULL UNIQUE,
+            topic TEXT,
+            count INTEGER NOT NULL,
+            created TEXT,
+            modified REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sets_created ON sets(created);
+        CREATE TABLE IF NOT EXISTS cards (
+            set_id INTEGER NOT NULL REFERENCES sets(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            card_id INTEGER,
+            question TEXT,
+            answer TEXT,
+            difficulty TEXT,
+            category TEXT,
+            created TEXT,
+            PRIMARY KEY (set_id, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_cards_card_id ON cards(set_id, card_id);
+        CREATE TABLE IF NOT EXISTS imported_files (
+            filename TEXT PRIMARY KEY
+        );
+    """
+
+    def __init__(self, db_path=FLASHCARDS_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # One connection shared by every thread (Streamlit sessions), serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(sets)")}
+        if columns and "modified" not in columns:
+            self._conn.execute("ALTER TABLE sets ADD COLUMN modified REAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def save_set(self, filename, topic, flashcards):
+        created = flashcards[0].get('created') if flashcards else None
+        rows = [
+            (position, card.get('id'), card.get('question'), card.get('answer'),
+             card.get('difficulty'), card.get('category'), card.get('created'))
+            for position, card in enumerate(flashcards)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sets WHERE filename = ?", (filename,))
+            cursor = self._conn.execute(
+                "INSERT INTO sets (filename, topic, count, created, modified) VALUES (?, ?, ?, ?, ?)",
+                (filename, topic, len(flashcards), created, time.time())
+            )
+            set_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO cards (set_id, position, card_id, question, answer, difficulty, category, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(set_id,) + row for row in rows]
+            )
+        return self._set_path(filename)
+
+    def load_set(self, filename):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cards.card_id AS id, question, answer, difficulty, category, cards.created "
+                "FROM cards JOIN sets ON sets.id = cards.set_id "
+                "WHERE sets.filename = ? ORDER BY position",
+                (filename,)
+            ).fetchall()
+            if not rows and not self._exists(filename):
+                return None
+        return [self._card(row) for row in rows]
+
+    def open_deck(self, filename):
+        """Open a set for lazy, paged access without reading its cards"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, count FROM sets WHERE filename = ?", (filename,)
+            ).fetchone()
+        if row is None:
+            return None
+        return SQLiteDeck(self, row['id'], row['count'])
+
+    def import_deck(self, source, filename, topic=None):
+        """Stream a .json/.jsonl file into the database in batches"""
+        cards = iter_cards(source)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sets WHERE filename = ?", (filename,))
+            set_id = self._conn.execute(
+                "INSERT INTO sets (filename, topic, count, created, modified) VALUES (?, ?, 0, NULL, ?)",
+                (filename, topic, time.time())
+            ).lastrowid
+
+            count, first = 0, None
+            while True:
+                batch = list(islice(cards, IMPORT_BATCH_SIZE))
+                if not batch:
+                    break
+                first = first or batch[0]
+                self._conn.executemany(
+                    "INSERT INTO cards (set_id, position, card_id, question, answer, difficulty, category, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (set_id, count + offset, card.get('id'), card.get('question'), card.get('answer'),
+                         card.get('difficulty'), card.get('category'), card.get('created'))
+                        for offset, card in enumerate(batch)
+                    ]
+                )
+                count += len(batch)
+
+            first = first or {}
+            self._conn.execute(
+                "UPDATE sets SET count = ?, topic = ?, created = ? WHERE id = ?",
+                (count, topic or first.get('category', 'Unknown'), first.get('created'), set_id)
+            )
+        return filename, count
+
+    def latest_set(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename FROM sets ORDER BY created DESC, id DESC LIMIT 1"
+            ).fetchone()
+        return row['filename'] if row else None
+
+    def list_sets(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, count, topic, created, modified FROM sets "
+                "WHERE count > 0 ORDER BY created DESC"
+            ).fetchall()
+        return [
+            {
+                'filename': row['filename'],
+                'count': row['count'],
+                'topic': row['topic'] or 'Unknown',
+                'created': row['created'] or 'Unknown',
+                'modified': row['modified'],
+                'path': self._set_path(row['filename'])
+            }
+            for row in rows
+        ]
+
+    def set_info(self, filename):
+        """One set's list_sets() entry"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, count, topic, created, modified FROM sets WHERE filename = ?", (filename,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'filename': row['filename'],
+            'count': row['count'],
+            'topic': row['topic'] or 'Unknown',
+            'created': row['created'] or 'Unknown',
+            'modified': row['modified'],
+            'path': self._set_path(row['filename'])
+        }
+
+    def delete_set(self, filename):
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM sets WHERE filename = ?", (filename,))
+        return cursor.rowcount > 0
+
+    def import_json_dir(self, directory=FLASHCARDS_DIR):
+        """Import JSON flashcard files that are not in the database yet"""
+        directory = Path(directory)
+        if not directory.exists():
+            return 0
+
+        # Files imported once are remembered, so sets deleted later stay deleted
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT filename FROM imported_files")}
+
+        imported = 0
+        for file in sorted(os.listdir(directory)):
+            if not file.endswith('.json') or file in known:
+                continue
+            try:
+                with open(directory / file, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Skipping {file}: {e}")
+                continue
+            if isinstance(data, list) and data:
+                self.save_set(file, data[0].get('category', 'Unknown'), data)
+                imported += 1
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR IGNORE INTO imported_files VALUES (?)", (file,))
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _fetch(self, sql, params):
+        with self._lock:
+            return [self._card(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _exists(self, filename):
+        return self._conn.execute("SELECT 1 FROM sets WHERE filename = ?", (filename,)).fetchone() is not None
+
+    def _set_path(self, filename):
+        return f"{self.db_path}::{filename}"
+
+    @staticmethod
+    def _card(row):
+        card = {field: row[field] for field in CARD_FIELDS}
+        # AI-generated cards may have no id or timestamp
+        for field in ('id', 'created'):
+            if card[field] is None:
+                del card[field]
+        return card
+
+
+class SQLiteDeck(Sequence):
+    """Read-only view of one stored set; cards are queried by position on demand"""
+
+    def __init__(self, store, set_id, count):
+        self._store = store
+        self._set_id = set_id
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self.page(start, stop - start)
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("card index out of range")
+        cards = self._store._fetch(
+            f"SELECT {CARD_COLUMNS} FROM cards WHERE set_id = ? AND position = ?",
+            (self._set_id, index)
+        )
+        if not cards:
+            raise IndexError("card index out of range")
+        return cards[0]
+
+    def __iter__(self):
+        for offset in range(0, self._count, IMPORT_BATCH_SIZE):
+            yield from self.page(offset, IMPORT_BATCH_SIZE)
+
+    def page(self, offset, limit):
+        """Return up to limit cards starting at position offset"""
+        if limit <= 0:
+            return []
+        return self._store._fetch(
+            f"SELECT {CARD_COLUMNS} FROM cards "
+            "WHERE set_id = ? AND position >= ? AND position < ? ORDER BY position",
+            (self._set_id, offset, offset + limit)
+        )
+
+    def get_by_id(self, card_id):
+        """Random access by card id through the (set_id, card_id) index"""
+        cards = self._store._fetch(
+            f"SELECT {CARD_COLUMNS} FROM cards WHERE set_id = ? AND card_id = ? LIMIT 1",
+            (self._set_id, card_id)
+        )
+        return cards[0] if cards else None
+
+    def close(self):
+        pass
+
+
+# Tests
+def _crash(store):
+    """Stop a JSONDeckStore the way a killed process would: no compaction, log left behind"""
+    store._closed = True
+    store._compact_wakeup.set()
+    store._compactor.join()
+    store.log.close()
+
+
+def test_manifest_recovered_from_log():
+    """A save logged but never compacted rebuilds a lost or stale manifest on restart"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = JSONDeckStore(directory, compact_interval=3600)
+        store.save_set("cells.json", "Biology", [{"id": 1, "question": "Cell?", "answer": "Unit of life",
+                                                 "category": "Biology"}])
+        store.compact()
+        old_manifest = open(store.manifest_path).read()
+
+        # Second save is in the log and on disk, then the process dies before compacting
+        store.save_set("cells.json", "Biology", [
+            {"id": 1, "question": "Cell?", "answer": "Unit of life", "category": "Biology"},
+            {"id": 2, "question": "Nucleus?", "answer": "Holds the DNA", "category": "Biology"},
+        ])
+        assert store.log.size() > 0
+        _crash(store)
+
+        # The manifest on disk went back to the pre-crash version, plus a torn rewrite
+        with open(Path(directory) / JSONDeckStore.MANIFEST_NAME, "w") as f:
+            f.write(old_manifest)
+        with open(Path(directory) / ".manifest.tmp", "w") as f:
+            f.write('{"version": 1, "sets": {"cel')
+
+        store = JSONDeckStore(directory, compact_interval=3600)
+        sets = {s["filename"]: s for s in store.list_sets()}
+        assert sets["cells.json"]["count"] == 2, sets
+        assert store.set_info("cells.json")["count"] == 2
+        assert len(store.load_set("cells.json")) == 2
+        assert not os.path.exists(Path(directory) / ".manifest.tmp")
+        assert store.log.size() == 0, "log was not compacted after recovery"
+        store.close()
+
+        # A clean restart has nothing left to replay
+        store = JSONDeckStore(directory, compact_interval=3600)
+        assert store.log.replay() == []
+        assert store.set_info("cells.json")["count"] == 2
+        store.close()
+        print("✅ Manifest rebuilt from the log after a crash before compaction")
+
+
+def test_logged_delete_survives_crash():
+    """A delete logged before a crash removes the set and its manifest entry on restart"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = JSONDeckStore(directory, compact_interval=3600)
+        card = {"id": 1, "question": "Atom?", "answer": "Unit of matter", "category": "Chemistry"}
+        store.save_set("atoms.json", "Chemistry", [card])
+        store.save_set("ions.json", "Chemistry", [card])
+        store.compact()
+
+        # The delete reached the log, but not the deck file or the manifest
+        store.log.append({"op": "delete", "filename": "atoms.json"})
+        _crash(store)
+
+        store = JSONDeckStore(directory, compact_interval=3600)
+        assert [s["filename"] for s in store.list_sets()] == ["ions.json"]
+        assert store.set_info("atoms.json") is None
+        assert not os.path.exists(Path(directory) / "atoms.json")
+        assert store.log.size() == 0
+        store.close()
+        print("✅ Logged delete applied to the manifest after a crash")
+
+
+def test_manifest_notices_out_of_band_edits():
+    """A deck file changed behind the store's back is re-parsed on the next listing"""
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = JSONDeckStore(directory, compact_interval=3600)
+        card = {"id": 1, "question": "Gene?", "answer": "A unit of heredity", "category": "Biology"}
+        store.save_set("genes.json", "Biology", [card])
+        assert store.list_sets()[0]["count"] == 1
+
+        time.sleep(0.01)
+        with open(Path(directory) / "genes.json", "w") as f:
+            json.dump([card, dict(card, id=2), dict(card, id=3)], f)
+        assert store.list_sets()[0]["count"] == 3
+        store.close()
+        print("✅ Out-of-band deck edits are picked up by the manifest")
+
+
+if __name__ == "__main__":
+    test_manifest_recovered_from_log()
+    test_logged_delete_survives_crash()
+    test_manifest_notices_out_of_band_edits()
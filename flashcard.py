@@ -0,0 +1,153 @@
+# modules/flashcard.py
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from enum import IntEnum
+
+FIELDS = ("id", "question", "answer", "difficulty", "category", "created")
+
+
+class Difficulty(IntEnum):
+    EASY = 1
+    MEDIUM = 2
+    HARD = 3
+
+
+DIFFICULTY_BY_NAME = {level.name.lower(): level for level in Difficulty}
+DIFFICULTY_NAMES = {level: name for name, level in DIFFICULTY_BY_NAME.items()}
+
+
+class Flashcard(Mapping):
+    """Compact flashcard that still reads like the old dict (card['question']).
+
+    Difficulty is enum-coded, the category is interned so a deck shares one
+    string, and the timestamp is a float instead of an ISO string.
+    """
+
+    __slots__ = ("id", "question", "answer", "_difficulty", "category", "_created", "_extra")
+
+    def __init__(self, id=None, question=None, answer=None, difficulty=None,
+                 category=None, created=None, extra=None):
+        self.id = id
+        self.question = question
+        self.answer = answer
+        self._difficulty = self._encode_difficulty(difficulty)
+        self.category = sys.intern(category) if isinstance(category, str) else category
+        self._created = self._encode_created(created)
+        self._extra = extra or None
+
+    @classmethod
+    def from_dict(cls, card):
+        if isinstance(card, Flashcard):
+            return card
+        extra = {key: value for key, value in card.items() if key not in FIELDS}
+        return cls(card.get("id"), card.get("question"), card.get("answer"),
+                   card.get("difficulty"), card.get("category"), card.get("created"), extra)
+
+    @property
+    def difficulty(self):
+        return DIFFICULTY_NAMES.get(self._difficulty, self._difficulty)
+
+    @property
+    def difficulty_level(self):
+        return self._difficulty if isinstance(self._difficulty, Difficulty) else None
+
+    @property
+    def created(self):
+        if isinstance(self._created, float):
+            return datetime.fromtimestamp(self._created).isoformat()
+        return self._created
+
+    @property
+    def created_timestamp(self):
+        return self._created if isinstance(self._created, float) else None
+
+    def __getitem__(self, key):
+        if key in FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for field in FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Flashcard({self.to_dict()!r})"
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def set_extra(self, **fields):
+        """Attach fields beyond the standard ones (e.g. the saved set a card belongs to)"""
+        self._extra = {**(self._extra or {}), **fields}
+
+    @staticmethod
+    def _encode_difficulty(difficulty):
+        if isinstance(difficulty, str):
+            return DIFFICULTY_BY_NAME.get(difficulty.lower()) or sys.intern(difficulty)
+        return difficulty
+
+    @staticmethod
+    def _encode_created(created):
+        """Naive ISO timestamps (what generate() writes) become floats; others are kept as-is"""
+        if isinstance(created, str):
+            try:
+                parsed = datetime.fromisoformat(created)
+            except ValueError:
+                return created
+            if parsed.tzinfo is None:
+                return parsed.timestamp()
+        return created
+
+
+def compact_deck(cards):
+    """Convert dict cards to Flashcards"""
+    return [Flashcard.from_dict(card) for card in cards]
+
+
+def benchmark(count=10000):
+    """Compare the per-card memory of dict cards and Flashcards"""
+    import tracemalloc
+
+    def build_dicts():
+        return [
+            {
+                "id": i + 1,
+                "question": f"Question {i} about photosynthesis?",
+                "answer": f"Answer {i}: plants convert sunlight to food.",
+                "difficulty": ("easy", "medium", "hard")[i % 3],
+                "category": " ".join(("Science", "Basics")),  # a fresh string per card, as json.load gives
+                "created": datetime.now().isoformat(),
+            }
+            for i in range(count)
+        ]
+
+    def measure(build):
+        tracemalloc.start()
+        deck = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del deck
+        return current / count
+
+    dict_bytes = measure(build_dicts)
+    compact_bytes = measure(lambda: compact_deck(build_dicts()))
+
+    print(f"📏 {count} cards (question and answer text included)")
+    print(f"  • dict cards:      {dict_bytes:.0f} bytes/card")
+    print(f"  • Flashcard cards: {compact_bytes:.0f} bytes/card ({1 - compact_bytes / dict_bytes:.0%} smaller)")
+    return dict_bytes, compact_bytes
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,9 +1,15 @@
 # modules/flashcard_generator.py - FIXED VERSION
-import json
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 
+from modules.deck_search import DeckSearchIndex, set_version
+from modules.deck_store import FLASHCARDS_DB, JSONDeckStore, SQLiteDeckStore
+from modules.flashcard import Flashcard, compact_deck
+from modules.review_history import ReviewHistory
+from modules.review_scheduler import AGAIN, GOOD, RECALLED, ReviewScheduler
+
 # Define paths directly here - NO config import
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "data"
@@ -14,21 +20,60 @@ for directory in [DATA_DIR, FLASHCARDS_DIR]:
     directory.mkdir(exist_ok=True)
 
 class FlashcardSystem:
-    def __init__(self):
+    def __init__(self, storage=None):
         self.flashcards = []
-        print(f"📚 Flashcard system ready. Data directory: {FLASHCARDS_DIR}")
+        # Set the cards came from (None for generated cards) - part of each card's review key
+        self.deck_name = None
+        self.scheduler = ReviewScheduler()
+        self.history = ReviewHistory()
+        # Guards self.flashcards when one system serves several threads (web sessions)
+        self._lock = threading.RLock()
+        self._write_listeners = []
+        # Sets larger than this are opened lazily instead of loaded into memory
+        self.lazy_threshold = int(os.getenv("FLASHCARD_LAZY_THRESHOLD", "5000"))
+        
+        # FLASHCARD_STORAGE=json keeps the one-file-per-set layout
+        storage = storage or os.getenv("FLASHCARD_STORAGE", "sqlite")
+        if storage == "json":
+            self.store = JSONDeckStore(FLASHCARDS_DIR)
+            print(f"📚 Flashcard system ready. Data directory: {FLASHCARDS_DIR}")
+        else:
+            self.store = SQLiteDeckStore(FLASHCARDS_DB)
+            imported = self.store.import_json_dir(FLASHCARDS_DIR)
+            if imported:
+                print(f"📥 Imported {imported} flashcard sets from {FLASHCARDS_DIR}")
+            print(f"📚 Flashcard system ready. Database: {FLASHCARDS_DB}")
+        
+        # Search index over every saved set, kept current by the write listener
+        self.search_index = DeckSearchIndex()
+        indexed = self.search_index.sync(self.store.list_sets(), self.store.open_deck)
+        if indexed:
+            print(f"🔍 Indexed {indexed} flashcard sets for search")
+        self.add_write_listener(self._update_search_index)
     
-    def generate(self, topic, count=10, save=True):
-        """Generate flashcards for a topic"""
+    def generate(self, topic, count=10, save=True, append=True):
+        """Generate flashcards for a topic.
+
+        With append=False the cards are only returned, not added to self.flashcards.
+        """
         print(f"📝 Generating {count} flashcards about '{topic}'...")
         
         # Simple flashcard generation
         flashcards = self._simple_flashcards(topic, count)
         
         if save:
-            self.save_flashcards(flashcards, topic)
+            filename = self.set_filename(topic)
+            self.save_flashcards(flashcards, topic, filename)
+            # Review state follows the saved set, so these cards keep it once the set is loaded
+            for card in flashcards:
+                card.set_extra(saved_set=filename)
         
-        self.flashcards.extend(flashcards)
+        if append:
+            with self._lock:
+                if not isinstance(self.flashcards, list):
+                    self.flashcards = []  # Replace a lazily opened deck
+                self.flashcards.extend(flashcards)
+                self.deck_name = None
         return flashcards
     
     def _simple_flashcards(self, topic, count):
@@ -90,61 +135,101 @@ class FlashcardSystem:
             idx = i % len(found_template)
             question, answer, difficulty = found_template[idx]
             
-            flashcards.append({
-                "id": i + 1,
-                "question": question,
-                "answer": answer,
-                "difficulty": difficulty,
-                "category": topic,
-                "created": datetime.now().isoformat()
-            })
+            flashcards.append(Flashcard(
+                id=i + 1,
+                question=question,
+                answer=answer,
+                difficulty=difficulty,
+                category=topic,
+                created=datetime.now().timestamp()
+            ))
         
         return flashcards
     
-    def save_flashcards(self, flashcards, topic):
-        """Save flashcards to JSON file"""
-        filename = f"{topic.lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = FLASHCARDS_DIR / filename
-        
-        with open(filepath, 'w') as f:
-            json.dump(flashcards, f, indent=2)
+    @staticmethod
+    def set_filename(topic):
+        return f"{topic.lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    
+    def save_flashcards(self, flashcards, topic, filename=None):
+        """Save flashcards as a named set"""
+        filename = filename or self.set_filename(topic)
+        filepath = self.store.save_set(filename, topic, flashcards)
+        self._notify_write("save", filename)
         
         print(f"💾 Saved {len(flashcards)} flashcards to {filepath}")
         return filepath
     
-    def load_flashcards(self, filename=None):
-        """Load flashcards from JSON file"""
-        if filename:
-            filepath = FLASHCARDS_DIR / filename
-        else:
-            # Load most recent file
-            files = list(FLASHCARDS_DIR.glob("*.json"))
-            if not files:
+    def import_deck(self, source, topic=None):
+        """Import a large .json/.jsonl deck file without loading it into memory"""
+        name = Path(source).stem
+        filename, count = self.store.import_deck(source, f"{name}.json", topic)
+        self._notify_write("import", filename)
+        print(f"📥 Imported {count} flashcards from {source}")
+        return filename
+    
+    def open_deck(self, filename):
+        """Open a saved set for paging and lookups by card id"""
+        return self.store.open_deck(filename)
+    
+    def load_flashcards(self, filename=None, lazy=None):
+        """Load a saved set (the most recent one if no filename is given).
+
+        Large sets (or lazy=True) come back as a deck that reads cards on demand.
+        """
+        if not filename:
+            filename = self.store.latest_set()
+            if not filename:
                 return []
-            filepath = max(files, key=os.path.getctime)
         
-        if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                self.flashcards = json.load(f)
-            print(f"📂 Loaded {len(self.flashcards)} flashcards from {filepath.name}")
-            return self.flashcards
+        flashcards = self.read_set(filename, lazy)
+        if flashcards is not None:
+            with self._lock:
+                self.flashcards = flashcards
+                self.deck_name = filename
+            print(f"📂 Loaded {len(flashcards)} flashcards from {filename}")
+            return flashcards
         return []
     
+    def read_set(self, filename, lazy=None):
+        """Return a saved set's cards without making it the current deck"""
+        if lazy is None:
+            counts = {s['filename']: s['count'] for s in self.store.list_sets()}
+            lazy = counts.get(filename, 0) > self.lazy_threshold
+        
+        if lazy:
+            return self.store.open_deck(filename)
+        flashcards = self.store.load_set(filename)
+        return compact_deck(flashcards) if flashcards is not None else None
+    
     def quiz_mode(self):
-        """Interactive quiz mode"""
-        if not self.flashcards:
+        """Interactive quiz over the cards that are due for review (SM-2 scheduling)"""
+        with self._lock:
+            cards, deck_name = self.flashcards, self.deck_name  # A deck loaded meanwhile does not change this quiz
+        if not cards:
             print("❌ No flashcards available. Generate or load some first!")
             return
         
+        queue = self.scheduler.due_queue(cards, deck_name)
+        total = queue.count_due()
+        if not total:
+            next_due = queue.next_due()
+            print("✅ Nothing due for review." + (
+                f" Next card is due {datetime.fromtimestamp(next_due):%Y-%m-%d %H:%M}." if next_due else ""))
+            return
+        
         print("\n" + "="*50)
         print("🎯 FLASHCARD QUIZ")
         print("="*50)
         
         score = 0
-        total = len(self.flashcards)
         
-        for i, card in enumerate(self.flashcards, 1):
-            print(f"\n📊 Progress: {i}/{total}")
+        # Earliest-due card first; cards are read on demand so lazy decks stay on disk
+        for i in range(total):
+            position = queue.pop_due()
+            if position is None:
+                break
+            card = cards[position]
+            print(f"\n📊 Progress: {i + 1}/{total}")
             print(f"📝 Question: {card['question']}")
             print(f"🏷️  Category: {card['category']}")
             print(f"⚡ Difficulty: {card['difficulty'].upper()}")
@@ -152,12 +237,19 @@ class FlashcardSystem:
             input("\nPress Enter to reveal answer...")
             print(f"✅ Answer: {card['answer']}")
             
-            correct = input("\nDid you get it right? (y/n): ").lower().strip()
-            if correct == 'y':
+            correct = input("\nDid you get it right? (y/n, or rate recall 0-5): ").lower().strip()
+            if correct in ('0', '1', '2', '3', '4', '5'):
+                quality = int(correct)
+            else:
+                quality = GOOD if correct == 'y' else AGAIN
+            state = self.record_review(card, position, quality, deck_name)
+            
+            if quality >= RECALLED:
                 score += 1
                 print("🎉 Correct! Well done!")
             else:
                 print("💡 Keep practicing this one!")
+            print(f"📅 Next review in {state['interval']:g} day(s)")
             
             print("-" * 40)
         
@@ -166,6 +258,9 @@ class FlashcardSystem:
         print("🏁 QUIZ COMPLETE!")
         print(f"{'='*50}")
         print(f"📊 Your score: {score}/{total} ({percentage:.1f}%)")
+        self.history.flush()
+        streak = self.history.get_stats(days=1)['current_streak']
+        print(f"🔥 Study streak: {streak} day{'s' if streak != 1 else ''}")
         
         if percentage >= 90:
             print("🎖️  EXCELLENT! You've mastered this topic!")
@@ -176,38 +271,46 @@ class FlashcardSystem:
         else:
             print("🔁 NEED PRACTICE. Study the material again.")
     
+    def record_review(self, card, position, quality, deck_name=None):
+        """Reschedule a card after an answer and add the answer to the review history"""
+        state = self.scheduler.review(card, position, quality, deck_name)
+        self.history.record(card.get('category'), card.get('difficulty'), quality >= RECALLED,
+                            deck=state['deck'], card_id=state['card_id'], quality=quality)
+        return state
+    
     def list_saved_sets(self):
-        """List all saved flashcard sets"""
-        if not os.path.exists(FLASHCARDS_DIR):
-            return []
-        
-        flashcard_files = []
-        for file in os.listdir(FLASHCARDS_DIR):
-            if file.endswith('.json'):
-                filepath = FLASHCARDS_DIR / file
-                try:
-                    with open(filepath, 'r') as f:
-                        data = json.load(f)
-                    if data:  # Check if not empty
-                        flashcard_files.append({
-                            'filename': file,
-                            'count': len(data),
-                            'topic': data[0].get('category', 'Unknown'),
-                            'created': data[0].get('created', 'Unknown'),
-                            'path': str(filepath)
-                        })
-                except:
-                    continue
-        
-        # Sort by creation date (newest first)
-        flashcard_files.sort(key=lambda x: x.get('created', ''), reverse=True)
-        return flashcard_files
+        """List all saved flashcard sets (newest first)"""
+        return self.store.list_sets()
+    
+    def add_write_listener(self, callback):
+        """Call callback(event, filename) after every save, delete or import"""
+        with self._lock:
+            self._write_listeners.append(callback)
+    
+    def search(self, query, limit=20):
+        """Full-text search over every saved set, best matches first"""
+        return self.search_index.search(query, limit)
+    
+    def _update_search_index(self, event, filename):
+        if event == "delete":
+            self.search_index.remove_set(filename)
+        else:
+            cards = self.store.open_deck(filename)
+            if cards is not None:
+                # Record the version the startup sync() compares against
+                info = self.store.set_info(filename)
+                self.search_index.index_set(filename, cards, set_version(info) if info else None)
+    
+    def _notify_write(self, event, filename):
+        with self._lock:
+            listeners = list(self._write_listeners)
+        for callback in listeners:
+            callback(event, filename)
     
     def delete_set(self, filename):
         """Delete a flashcard set"""
-        filepath = FLASHCARDS_DIR / filename
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        if self.store.delete_set(filename):
+            self._notify_write("delete", filename)
             print(f"🗑️  Deleted {filename}")
             return True
         else:
@@ -1,228 +1,812 @@
 # modules/free_ai_core.py
+import asyncio
+import contextvars
+import importlib.util
 import json
 import os
 import random
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 from dotenv import load_dotenv
 
+from modules.key_pool import KEY_ERROR, PROVIDER_ERROR, KeyPool, error_scope, keys_from_env
+from modules.knowledge_index import load_knowledge_base
+from modules.metrics import LATENCY_BUCKETS, REGISTRY, start_metrics_server
+from modules.study_retriever import STUDY_CORPUS_DIR, StudyRetriever
+from modules.provider_health import HealthTracker
+from modules.rate_limiter import BACKGROUND, INTERACTIVE, RateLimiter
+from modules.response_cache import ResponseCache
+from modules.tracing import current_span, iterate_in, tracer, use_span
+
 load_dotenv()
 
+_UNSET = object()
+
+# Hot-path metrics (see modules/metrics.py; METRICS_PORT serves them to Prometheus)
+ANSWERS = REGISTRY.histogram(
+    "ai_answer_seconds", "Time to answer a question, by where the answer came from",
+    # A question can wait on rate limits and fall through several providers,
+    # so it can take well past one call's 30s timeout
+    ["mode", "source"], buckets=LATENCY_BUCKETS + (60.0, 120.0)
+)
+FALLBACK_DEPTH = REGISTRY.histogram(
+    "ai_fallback_depth", "Failed provider calls before a question was answered",
+    ["source"], buckets=(0, 1, 2, 3)
+)
+PROVIDER_SECONDS = REGISTRY.histogram(
+    "ai_provider_seconds", "Latency of one provider call", ["provider", "operation", "outcome"]
+)
+PROVIDER_ERRORS = REGISTRY.counter(
+    "ai_provider_errors_total", "Failed provider calls by exception type", ["provider", "error"]
+)
+TOKENS = REGISTRY.counter(
+    "ai_tokens_total", "Tokens reported by the providers", ["provider", "operation", "kind"]
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "ai_cache_lookups_total", "Answer cache lookups", ["cache", "result"]
+)
+OFFLINE_ANSWERS = REGISTRY.counter(
+    "ai_offline_answers_total", "Answers given without a provider, by fallback", ["fallback"]
+)
+FLASHCARD_SETS = REGISTRY.counter(
+    "ai_flashcard_sets_total", "Generated flashcard sets by source", ["source"]
+)
+FLASHCARD_PARSE_FAILURES = REGISTRY.counter(
+    "ai_flashcard_parse_failures_total", "Provider flashcard replies that were not valid JSON", ["provider"]
+)
+
+# Per-question bookkeeping, shared with the executor threads a hedged question runs on
+_answer_state = contextvars.ContextVar("answer_state", default=None)
+
+def _module_available(name):
+    """Whether a module can be imported, without paying for the import"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
 class FreeStudentAI:
-    def __init__(self):
-        self.gemini_key = os.getenv("GEMINI_API_KEY", "")
-        self.deepseek_key = os.getenv("DEEPSEEK_API_KEY", "")
+    def __init__(self, warm_up=None):
+        # GEMINI_API_KEYS / DEEPSEEK_API_KEYS may list several keys to pool
+        gemini_keys = keys_from_env("GEMINI")
+        deepseek_keys = keys_from_env("DEEPSEEK")
+        self.gemini_key = gemini_keys[0] if gemini_keys else ""
+        self.deepseek_key = deepseek_keys[0] if deepseek_keys else ""
+        
+        # SDKs, models, the HTTP pool and the semantic cache are built on
+        # first use (or by warm_up) so startup doesn't pay for them
+        self._init_lock = threading.RLock()
+        self._warm_up_thread = None
+        self.warm_up_seconds = None
+        self._http = None
+        self._semantic_cache = _UNSET
+        
+        # Keep-alive connection pool shared by every DeepSeek request
+        self._http_options = {
+            "pool_size": int(os.getenv("DEEPSEEK_POOL_SIZE", "10")),
+            "keep_alive": os.getenv("HTTP_KEEP_ALIVE", "1") != "0",
+            "max_retries": int(os.getenv("HTTP_MAX_RETRIES", "3"))
+        }
+        
+        # Stay inside free-tier quotas (see get_free_keys.py) by queueing
+        # requests instead of running into 429s. The quota is per key, so
+        # the provider-wide limit grows with the number of keys.
+        key_rpm = {
+            "gemini": int(os.getenv("GEMINI_RPM", "60")),
+            "deepseek": int(os.getenv("DEEPSEEK_RPM", "60"))
+        }
+        self.rate_limiter = RateLimiter(
+            {
+                "gemini": key_rpm["gemini"] * max(1, len(gemini_keys)),
+                "deepseek": key_rpm["deepseek"] * max(1, len(deepseek_keys))
+            },
+            key_rpm=key_rpm
+        )
+        self.rate_limit_wait = {
+            INTERACTIVE: float(os.getenv("RATE_LIMIT_MAX_WAIT", "10")),
+            BACKGROUND: float(os.getenv("RATE_LIMIT_BACKGROUND_WAIT", "60"))
+        }
+        
+        key_cooldown = float(os.getenv("KEY_COOLDOWN_SECONDS", "60"))
+        self.key_cooldown = key_cooldown
+        self.key_pools = {
+            "gemini": KeyPool("gemini", gemini_keys, self.rate_limiter, key_cooldown),
+            "deepseek": KeyPool("deepseek", deepseek_keys, self.rate_limiter, key_cooldown)
+        }
+        
+        # Cache answers so repeated questions skip the upstream call
+        self.cache = ResponseCache(
+            max_memory_entries=int(os.getenv("RESPONSE_CACHE_MEMORY", "256")),
+            max_disk_entries=int(os.getenv("RESPONSE_CACHE_DISK", "5000")),
+            ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+        )
+        
+        # Offline answers, compiled once from the knowledge/*.json files
+        self.knowledge = load_knowledge_base()
+        
+        # BM25 search over the student's own notes in data/study_corpus
+        self.study_notes = StudyRetriever(
+            corpus_dir=os.getenv("STUDY_CORPUS_DIR") or STUDY_CORPUS_DIR
+        )
+        self.study_min_score = float(os.getenv("STUDY_MIN_SCORE", "1.0"))
+        
+        # Near-duplicate questions are answered from previously stored answers
+        self.semantic_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+        
+        # Seconds to wait on one provider before also asking the next;
+        # 0 races every provider at once
+        self.hedge_delay = float(os.getenv("AI_HEDGE_DELAY", "2.0"))
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-provider")
+        
+        # Where the most recent answer came from, tracked per thread because
+        # the web app shares one instance across sessions
+        self._local = threading.local()
         
         # Try to initialize available services
         self.available_services = []
         
-        if self.gemini_key:
-            try:
-                import google.generativeai as genai
-                genai.configure(api_key=self.gemini_key)
-                self.gemini_model = genai.GenerativeModel('gemini-pro')
+        # One Gemini model per key, since genai.configure() is process-wide
+        self._gemini_models = {}
+        self._gemini_lock = threading.Lock()
+        
+        if gemini_keys:
+            # Only check the SDK is installed; the models are built on first use
+            if _module_available("google.generativeai"):
                 self.available_services.append("gemini")
-                print("✅ Gemini AI: Ready")
-            except:
-                print("⚠️ Gemini: Failed to initialize")
+                print(f"✅ Gemini AI: Ready ({len(gemini_keys)} key{'s' if len(gemini_keys) > 1 else ''})")
+            else:
+                print("⚠️ Gemini: Failed to initialize (google-generativeai not installed)")
         
-        if self.deepseek_key:
+        if deepseek_keys:
             self.available_services.append("deepseek")
-            print("✅ DeepSeek: Ready")
+            print(f"✅ DeepSeek: Ready ({len(deepseek_keys)} key{'s' if len(deepseek_keys) > 1 else ''})")
+        
+        # Skip providers that keep failing instead of waiting on them every call
+        self.health = HealthTracker(
+            self.available_services,
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3")),
+            recovery_timeout=float(os.getenv("CIRCUIT_RECOVERY_SECONDS", "30"))
+        )
         
         if not self.available_services:
             print("⚠️ No free AI APIs configured. Using enhanced knowledge base.")
             print("   Get free keys:")
             print("   - Gemini: https://makersuite.google.com/app/apikey")
             print("   - DeepSeek: https://platform.deepseek.com/api_keys")
+        
+        metrics_port = os.getenv("METRICS_PORT")
+        if metrics_port:
+            start_metrics_server(int(metrics_port), host=os.getenv("METRICS_HOST", "127.0.0.1"))
+        
+        # Warm the providers up in the background while the student is still
+        # reading the menu; AI_WARM_UP=0 leaves everything to first use
+        if warm_up is None:
+            warm_up = os.getenv("AI_WARM_UP", "1") != "0"
+        if warm_up and self.available_services:
+            self.warm_up()
+    
+    @property
+    def http(self):
+        """Keep-alive pool for DeepSeek; requests is imported on first use"""
+        if self._http is None:
+            with self._init_lock:
+                if self._http is None:
+                    from modules.http_pool import PooledHTTPClient
+                    self._http = PooledHTTPClient(**self._http_options)
+        return self._http
+    
+    @property
+    def semantic_cache(self):
+        """The semantic cache, loaded on first use; None without numpy"""
+        if self._semantic_cache is _UNSET:
+            with self._init_lock:
+                if self._semantic_cache is _UNSET:
+                    try:
+                        from modules.semantic_cache import SemanticCache
+                    except ImportError:  # numpy not installed
+                        self._semantic_cache = None
+                    else:
+                        self._semantic_cache = SemanticCache(threshold=self.semantic_threshold)
+        return self._semantic_cache
+    
+    def warm_up(self, background=True):
+        """Import SDKs, build models and open connections before the first question.
+        
+        In the background a question asked mid warm-up simply waits on the
+        same lazy initializers instead of doing the work twice.
+        """
+        if not background:
+            self._warm_up()
+            return None
+        with self._init_lock:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(target=self._warm_up, name="ai-warm-up", daemon=True)
+                self._warm_up_thread.start()
+            return self._warm_up_thread
+    
+    def _warm_up(self):
+        start = time.perf_counter()
+        self.semantic_cache
+        if "gemini" in self.available_services:
+            for key in self.key_pools["gemini"].keys:
+                try:
+                    self._gemini_model(key)
+                except Exception as e:
+                    print(f"⚠️ Gemini: Failed to initialize ({e})")
+                    break
+        if "deepseek" in self.available_services:
+            # Leave a TLS connection to DeepSeek open in the pool
+            self.http.warm("https://api.deepseek.com")
+        self.warm_up_seconds = time.perf_counter() - start
+    
+    @property
+    def last_source(self):
+        """Where the most recent answer in this thread came from"""
+        return getattr(self._local, "source", None)
+    
+    @last_source.setter
+    def last_source(self, value):
+        self._local.source = value
+    
+    @property
+    def last_match(self):
+        """The similar question a semantic cache hit matched, if any"""
+        return getattr(self._local, "match", None)
+    
+    @last_match.setter
+    def last_match(self, value):
+        self._local.match = value
     
     def ask_question(self, question, subject=None):
         """Ask question using available free AI"""
         
-        # Try Gemini first
-        if "gemini" in self.available_services:
-            response = self._ask_gemini(question, subject)
-            if response and "Error" not in response:
+        # Hedge across providers when there is more than one to choose from
+        healthy = self._usable_services(self.available_services)
+        if len(healthy) > 1 and not self._event_loop_running():
+            return asyncio.run(self.ask_question_async(question, subject))
+        
+        with self._measure_answer("ask"):
+            cached = self._cached_answer(question, subject)
+            if cached:
+                return cached
+            
+            # Try Gemini first
+            if "gemini" in self.available_services:
+                response = self._call_provider("gemini", question, subject)
+                if response:
+                    self._remember_answer(question, subject, "gemini", response)
+                    return response
+            
+            # Try DeepSeek second
+            if "deepseek" in self.available_services:
+                response = self._call_provider("deepseek", question, subject)
+                if response:
+                    self._remember_answer(question, subject, "deepseek", response)
+                    return response
+            
+            # Fallback to local study notes, then the knowledge base
+            return self._offline_answer(question, subject)
+    
+    async def ask_question_async(self, question, subject=None, hedge_delay=None):
+        """Ask providers concurrently and return the first valid answer.
+        
+        The first provider starts immediately; each following one starts after
+        hedge_delay seconds or as soon as an earlier one fails. Slower providers
+        are cancelled once an answer arrives.
+        """
+        with self._measure_answer("hedged"):
+            cached = self._cached_answer(question, subject)
+            if cached:
+                return cached
+            
+            if hedge_delay is None:
+                hedge_delay = self.hedge_delay
+            
+            services = self._usable_services([s for s in ("gemini", "deepseek") if s in self.available_services])
+            winner = await self._race_providers(question, subject, services, hedge_delay)
+            if winner:
+                service, response = winner
+                self._remember_answer(question, subject, service, response)
                 return response
+            
+            # Fallback to local study notes, then the knowledge base
+            return self._offline_answer(question, subject)
+    
+    async def _race_providers(self, question, subject, services, hedge_delay):
+        """Return (service, answer) from the first provider with a valid answer"""
+        remaining = list(services)
+        pending = set()
         
-        # Try DeepSeek second
-        if "deepseek" in self.available_services:
-            response = self._ask_deepseek(question)
-            if response and "Error" not in response:
+        try:
+            while remaining or pending:
+                if remaining:
+                    service = remaining.pop(0)
+                    pending.add(asyncio.create_task(self._ask_provider_async(service, question, subject)))
+                
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=hedge_delay if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    service, response = task.result()
+                    if response:
+                        return service, response
+        finally:
+            # Blocking SDK calls keep running in their worker thread, but
+            # their results are discarded
+            for task in pending:
+                task.cancel()
+        
+        return None
+    
+    async def _ask_provider_async(self, service, question, subject=None):
+        # Own executor rather than the loop default, so asyncio.run() does not
+        # wait on a cancelled loser before returning
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self._executor, context.run, self._call_provider, service, question, subject
+        )
+        return service, response
+    
+    def _call_provider(self, service, question, subject=None):
+        """Call one provider through its key pool, rate limiter and circuit breaker.
+        
+        Returns the answer, or None if the provider failed or can't be used
+        right now. A key that is rejected or out of quota is swapped for
+        another key of the same provider before giving up on it.
+        """
+        with tracer.span(f"provider.{service}", provider=service, operation="ask") as span:
+            for attempt in range(max(1, len(self.key_pools[service]))):
+                key = self._claim(service)
+                if key is None:
+                    if attempt == 0:
+                        span.set_attribute("outcome", "skipped")
+                    return None
+                span.set_attribute("key", key.key_id)
+                span.set_attribute("attempts", attempt + 1)
+                
+                start = time.perf_counter()
+                try:
+                    if service == "gemini":
+                        response = self._ask_gemini(question, subject, key)
+                    else:
+                        response = self._ask_deepseek(question, key)
+                    if not response:
+                        raise ValueError("Empty response")
+                except Exception as e:
+                    span.record_exception(e)
+                    span.set_attribute("outcome", "error")
+                    PROVIDER_ERRORS.inc(provider=service, error=type(e).__name__)
+                    # The exception itself carries the status code and Retry-After
+                    if self._record_outcome(service, key, start, e) != KEY_ERROR:
+                        return None
+                    continue
+                
+                span.set_attribute("outcome", "ok")
+                self._record_outcome(service, key, start)
                 return response
+            return None
+    
+    @contextmanager
+    def _measure_answer(self, mode):
+        """Time one question and record where its answer came from and how many
+        provider calls failed on the way"""
+        state = {"failures": 0}
+        with tracer.span("ask_question", mode=mode) as span, self._answer_context(state):
+            self.last_source = None
+            start = time.perf_counter()
+            try:
+                yield state
+            finally:
+                self._finish_answer(mode, span, state, start)
+    
+    @staticmethod
+    @contextmanager
+    def _answer_context(state):
+        """Make one question's state current for a block"""
+        token = _answer_state.set(state)
+        try:
+            yield state
+        finally:
+            _answer_state.reset(token)
+    
+    def _finish_answer(self, mode, span, state, start):
+        source = self.last_source or "error"
+        ANSWERS.observe(time.perf_counter() - start, mode=mode, source=source)
+        FALLBACK_DEPTH.observe(state["failures"], source=source)
+        span.set_attribute("source", source)
+        span.set_attribute("fallback_depth", state["failures"])
+    
+    def get_metrics(self):
+        """Summary of the hot-path metrics for the statistics pages"""
+        answers = {source: ANSWERS.summary(source=source) for source in ANSWERS.label_values("source")}
+        providers = {}
+        for provider in PROVIDER_SECONDS.label_values("provider"):
+            latency = PROVIDER_SECONDS.summary(provider=provider)
+            ok = PROVIDER_SECONDS.summary(provider=provider, outcome="ok")["count"]
+            providers[provider] = {
+                "calls": latency["count"],
+                "error_rate": 1 - ok / latency["count"] if latency["count"] else 0.0,
+                "rate_limited": PROVIDER_SECONDS.summary(provider=provider, outcome="rate_limited")["count"],
+                "p50_seconds": latency["p50"],
+                "p95_seconds": latency["p95"],
+                "prompt_tokens": TOKENS.get(provider=provider, kind="prompt"),
+                "completion_tokens": TOKENS.get(provider=provider, kind="completion"),
+                "errors": PROVIDER_ERRORS.by("error", provider=provider),
+            }
+        total = sum(summary["count"] for summary in answers.values())
+        offline = sum(answers[s]["count"] for s in ("study_notes", "knowledge_base") if s in answers)
+        return {
+            "answers": answers,
+            "providers": providers,
+            "questions": total,
+            "offline_rate": offline / total if total else 0.0,
+            "mean_fallback_depth": FALLBACK_DEPTH.summary()["mean"],
+            "cache_lookups": {cache: CACHE_LOOKUPS.by("result", cache=cache) for cache in CACHE_LOOKUPS.label_values("cache")},
+            "offline_fallbacks": OFFLINE_ANSWERS.by("fallback"),
+            "flashcard_sets": FLASHCARD_SETS.by("source"),
+            "flashcard_parse_failures": FLASHCARD_PARSE_FAILURES.by("provider"),
+        }
+    
+    def _record_tokens(self, provider, operation, usage):
+        """Count the prompt/completion tokens a provider reported, if it did"""
+        if not usage:
+            return
+        if isinstance(usage, dict):
+            prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:  # Gemini usage_metadata
+            prompt = getattr(usage, "prompt_token_count", None)
+            completion = getattr(usage, "candidates_token_count", None)
+        if prompt:
+            TOKENS.inc(prompt, provider=provider, operation=operation, kind="prompt")
+        if completion:
+            TOKENS.inc(completion, provider=provider, operation=operation, kind="completion")
+    
+    def _usable_services(self, services):
+        """Providers whose circuit is closed (or probing) and that still have a key"""
+        return [s for s in self.health.available(services) if self.key_pools[s].has_usable_key()]
+    
+    def _claim(self, service, priority=INTERACTIVE):
+        """Pick a key and wait for quota; returns the key or None"""
+        breaker = self.health.get(service)
+        key = self.key_pools[service].choose()
+        if key is None or not breaker.is_available():
+            return None
+        
+        timeout = self.rate_limit_wait[priority]
+        with tracer.span("rate_limit.acquire", provider=service, key=key.key_id, priority=priority) as span:
+            granted = self.rate_limiter.acquire(service, key.key_id, priority=priority, timeout=timeout)
+            span.set_attribute("granted", granted)
+        if not granted:
+            return None
+        if not breaker.allow_request():
+            # Another caller holds the half-open probe; this call is not made
+            self.rate_limiter.refund(service, key.key_id)
+            return None
+        return key
+    
+    def _record_outcome(self, service, key, start, error=None, operation="ask"):
+        """Feed a call's result to the circuit breaker, key pool and metrics.
+        
+        Returns the error's scope (see key_pool.error_scope), or None on success.
+        Only transport and 5xx failures count against the provider's circuit;
+        auth and quota errors are the key's problem and go to the key pool.
+        """
+        elapsed = time.perf_counter() - start
+        breaker = self.health.get(service)
+        if error is None:
+            PROVIDER_SECONDS.observe(elapsed, provider=service, operation=operation, outcome="ok")
+            breaker.record_success(elapsed)
+            self.key_pools[service].report_success(key)
+            return None
+        
+        state = _answer_state.get()
+        if state is not None:
+            state["failures"] += 1
+        scope = error_scope(error)
+        self.key_pools[service].report_failure(key, error)
+        if scope == PROVIDER_ERROR:
+            breaker.record_failure(elapsed, error)
+        else:
+            breaker.release_probe()
         
-        # Fallback to enhanced knowledge base
-        return self._enhanced_knowledge_response(question, subject)
+        # Pause a key's bucket when the provider says its quota is used up,
+        # until its Retry-After or for a whole quota window
+        message = str(error)
+        rate_limited = scope == KEY_ERROR and ("429" in message or "quota" in message.lower()
+                                               or "exhausted" in message.lower())
+        if rate_limited:
+            self.rate_limiter.drain(service, key.key_id, self._retry_after(error) or self.key_cooldown)
+        outcome = "rate_limited" if rate_limited else "key_rejected" if scope == KEY_ERROR else "error"
+        PROVIDER_SECONDS.observe(elapsed, provider=service, operation=operation, outcome=outcome)
+        return scope
     
-    def _ask_gemini(self, question, subject=None):
-        """Use Google Gemini AI (free)"""
+    @staticmethod
+    def _retry_after(error):
+        """Seconds from a 429 response's Retry-After header, if the error carries one"""
+        response = getattr(error, "response", None)
+        value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
         try:
-            import google.generativeai as genai
-            
-            prompt = f"""You are a helpful, patient student tutor.
+            return float(value) if value else None
+        except ValueError:
+            return None  # An HTTP date; fall back to the cooldown
+    
+    @staticmethod
+    def _event_loop_running():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+    
+    def ask_question_stream(self, question, subject=None):
+        """Ask question and yield the answer in chunks as the provider sends them"""
+        # The span and answer state are current only while a chunk is being
+        # produced, never across a yield into the caller's code
+        state = {"failures": 0}
+        span = tracer.start_span("ask_question", mode="stream")
+        self.last_source = None
+        start = time.perf_counter()
+        try:
+            yield from iterate_in(span, self._stream_answer(question, subject),
+                                  lambda: self._answer_context(state))
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            self._finish_answer("stream", span, state, start)
+            span.end()
+    
+    def _stream_answer(self, question, subject=None):
+        cached = self._cached_answer(question, subject)
+        if cached:
+            yield cached
+            return
+        
+        streamers = [("gemini", self._stream_gemini), ("deepseek", self._stream_deepseek)]
+        for service, streamer in streamers:
+            if service not in self.available_services:
+                continue
+            # Another key of the same provider is tried when one is rejected or out of quota
+            for _ in range(max(1, len(self.key_pools[service]))):
+                span = tracer.start_span(f"provider.{service}", provider=service, operation="stream")
+                with use_span(span):
+                    key = self._claim(service)
+                if key is None:
+                    span.set_attribute("outcome", "skipped")
+                    span.end()
+                    break
+                span.set_attribute("key", key.key_id)
+                
+                chunks = []
+                error = None
+                scope = None
+                start = time.perf_counter()
+                try:
+                    for chunk in iterate_in(span, streamer(question, subject, key)):
+                        chunks.append(chunk)
+                        yield chunk
+                except Exception as e:
+                    error = e
+                    span.record_exception(e)
+                    if chunks:
+                        # Part of the answer is already on screen; don't restart it
+                        yield f"\n\n⚠️ Answer interrupted: {str(e)[:100]}"
+                        return
+                finally:
+                    # Runs even if the reader stops early, so a probe is never left open
+                    span.set_attribute("chunks", len(chunks))
+                    if chunks and error is None:
+                        span.set_attribute("outcome", "ok")
+                        self._record_outcome(service, key, start, operation="stream")
+                    else:
+                        span.set_attribute("outcome", "error")
+                        if error is not None:
+                            PROVIDER_ERRORS.inc(provider=service, error=type(error).__name__)
+                        scope = self._record_outcome(service, key, start, error or "Empty response",
+                                                     operation="stream")
+                    span.end()
+                
+                if chunks:
+                    self._remember_answer(question, subject, service, "".join(chunks))
+                    return
+                if scope != KEY_ERROR:
+                    break
+        
+        # Fallback to local study notes, then the knowledge base
+        yield self._offline_answer(question, subject)
+    
+    def _cached_answer(self, question, subject=None):
+        """Return an exact or near-duplicate cached answer, or None"""
+        self.last_match = None
+        
+        # Serve repeated questions from the cache
+        with tracer.span("cache.exact") as span:
+            cached = self.cache.get_any(question, subject, self.available_services)
+            span.set_attribute("hit", bool(cached))
+        CACHE_LOOKUPS.inc(cache="exact", result="hit" if cached else "miss")
+        if cached:
+            self.last_source = "cache"
+            return cached
+        
+        # Then questions worded differently but asking the same thing
+        if self.available_services and self.semantic_cache is not None:
+            with tracer.span("cache.semantic") as span:
+                match = self.semantic_cache.lookup(question, subject)
+                span.set_attribute("hit", bool(match))
+                if match:
+                    span.set_attribute("score", round(float(match[1]), 4))
+            CACHE_LOOKUPS.inc(cache="semantic", result="hit" if match else "miss")
+            if match:
+                entry, score = match
+                self.last_source = "semantic_cache"
+                self.last_match = {"question": entry["question"], "score": score}
+                return entry["answer"]
+        
+        return None
+    
+    def _remember_answer(self, question, subject, provider, response):
+        """Record a provider answer in both caches"""
+        self.last_source = provider
+        self.cache.set(question, subject, provider, response)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(question, subject, provider, response)
+    
+    def _gemini_prompt(self, question, subject=None):
+        return f"""You are a helpful, patient student tutor.
             Explain this in simple, step-by-step manner: {question}
             
             If relevant to subject ({subject}), focus on that.
             Use examples and analogies students can understand."""
-            
-            response = self.gemini_model.generate_content(prompt)
-            return response.text
-            
-        except Exception as e:
-            return f"Gemini Error: {str(e)[:100]}"
     
-    def _ask_deepseek(self, question):
-        """Use DeepSeek AI (free)"""
-        try:
-            url = "https://api.deepseek.com/v1/chat/completions"
-            
-            headers = {
-                "Authorization": f"Bearer {self.deepseek_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": "deepseek-chat",
-                "messages": [
-                    {
-                        "role": "system", 
-                        "content": "You are a helpful student tutor. Explain concepts simply and step-by-step."
-                    },
-                    {
-                        "role": "user",
-                        "content": question
-                    }
-                ],
-                "max_tokens": 1000,
-                "temperature": 0.7
-            }
-            
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+    def _gemini_model(self, key):
+        """Return the Gemini model bound to one API key, building it on first use"""
+        with self._gemini_lock:
+            model = self._gemini_models.get(key.key_id)
+            if model is None:
+                import google.generativeai as genai
+                from google.generativeai import client as genai_client
+                
+                genai.configure(api_key=key.value)
+                model = genai.GenerativeModel('gemini-pro')
+                # The model picks up the global client lazily; pin it now so the
+                # next key's configure() call doesn't swap it out
+                model._client = genai_client.get_default_generative_client()
+                self._gemini_models[key.key_id] = model
+            return model
+    
+    def _deepseek_request(self, question, stream=False, key=None):
+        """Build the DeepSeek chat completion URL, headers and payload"""
+        url = "https://api.deepseek.com/v1/chat/completions"
+        
+        headers = {
+            "Authorization": f"Bearer {key.value if key else self.deepseek_key}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "model": "deepseek-chat",
+            "messages": [
+                {
+                    "role": "system", 
+                    "content": "You are a helpful student tutor. Explain concepts simply and step-by-step."
+                },
+                {
+                    "role": "user",
+                    "content": question
+                }
+            ],
+            "max_tokens": 1000,
+            "temperature": 0.7,
+            "stream": stream
+        }
+        if stream:
+            # Ask for a final chunk with token usage
+            data["stream_options"] = {"include_usage": True}
+        return url, headers, data
+    
+    def _ask_gemini(self, question, subject=None, key=None):
+        """Use Google Gemini AI (free); raises on failure"""
+        model = self._gemini_model(key or self.key_pools["gemini"].keys[0])
+        response = model.generate_content(self._gemini_prompt(question, subject))
+        self._record_tokens("gemini", "ask", getattr(response, "usage_metadata", None))
+        return response.text
+    
+    def _ask_deepseek(self, question, key=None):
+        """Use DeepSeek AI (free); raises on failure"""
+        url, headers, data = self._deepseek_request(question, key=key)
+        
+        response = self.http.post(url, headers=headers, json=data, timeout=30)
+        response.raise_for_status()
+        
+        result = response.json()
+        self._record_tokens("deepseek", "ask", result.get('usage'))
+        return result['choices'][0]['message']['content']
+    
+    def _stream_gemini(self, question, subject=None, key=None):
+        """Yield Gemini answer chunks as they are generated"""
+        model = self._gemini_model(key or self.key_pools["gemini"].keys[0])
+        response = model.generate_content(
+            self._gemini_prompt(question, subject), stream=True
+        )
+        usage = None
+        for chunk in response:
+            # Running totals; the last chunk's are the final ones
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if chunk.text:
+                yield chunk.text
+        self._record_tokens("gemini", "stream", usage)
+    
+    def _stream_deepseek(self, question, subject=None, key=None):
+        """Yield DeepSeek answer chunks from its server-sent event stream"""
+        url, headers, data = self._deepseek_request(question, stream=True, key=key)
+        
+        with self.http.post(url, headers=headers, json=data, stream=True, timeout=30) as response:
             response.raise_for_status()
             
-            result = response.json()
-            return result['choices'][0]['message']['content']
-            
-        except Exception as e:
-            return f"DeepSeek Error: {str(e)[:100]}"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                event = json.loads(payload)
+                if event.get('usage'):
+                    self._record_tokens("deepseek", "stream", event['usage'])
+                if not event.get('choices'):
+                    continue
+                delta = event['choices'][0].get('delta', {})
+                if delta.get('content'):
+                    yield delta['content']
+    
+    def _offline_answer(self, question, subject=None):
+        """Answer without any AI provider: study notes first, then the knowledge base"""
+        with tracer.span("offline.study_notes") as span:
+            answer = self._study_notes_response(question)
+            span.set_attribute("hit", bool(answer))
+        if answer:
+            self.last_source = "study_notes"
+            OFFLINE_ANSWERS.inc(fallback="study_notes")
+            return answer
+        
+        self.last_source = "knowledge_base"
+        with tracer.span("offline.knowledge_base"):
+            return self._enhanced_knowledge_response(question, subject)
+    
+    def _study_notes_response(self, question):
+        """Quote the best-matching passages from the local study corpus"""
+        results = [(score, passage) for score, passage in self.study_notes.search(question, k=2)
+                   if score >= self.study_min_score]
+        if not results:
+            return None
+        
+        sections = [f"**From `{passage['doc']}`:**\n{passage['text']}" for _, passage in results]
+        return "📚 **From your study notes**\n\n" + "\n\n---\n\n".join(sections)
     
     def _enhanced_knowledge_response(self, question, subject=None):
         """Enhanced local knowledge base when no AI is available"""
-        knowledge_base = {
-            # Science
-            "photosynthesis": """🌿 **PHOTOSYNTHESIS**
-Plants convert sunlight, water, and CO₂ into food (glucose) and oxygen.
-
-**Process:**
-1. Sunlight absorbed by chlorophyll (green pigment)
-2. Water absorbed by roots (H₂O)
-3. Carbon dioxide from air (CO₂)
-4. Produces: Glucose (C₆H₁₂O₆) + Oxygen (O₂)
-
-**Equation:** 6CO₂ + 6H₂O + sunlight → C₆H₁₂O₆ + 6O₂
-
-**Importance:**
-• Produces oxygen we breathe
-• Base of food chain
-• Removes CO₂ from air""",
-            
-            "mitochondria": """🔬 **MITOCHONDRIA - Cell Powerhouse**
-Produces ATP (energy) through cellular respiration.
-
-**Structure:**
-- Double membrane
-- Inner folds = cristae
-- Matrix inside
-
-**ATP Production:** ~36 ATP per glucose molecule""",
-            
-            # Math
-            "algebra": """🧮 **ALGEBRA BASICS**
-Solving equations: Isolate the variable.
-
-**Example:** 3x + 5 = 14
-1. Subtract 5: 3x = 9
-2. Divide by 3: x = 3
-
-**Check:** 3(3) + 5 = 9 + 5 = 14 ✓""",
-            
-            "geometry": """📐 **GEOMETRY FORMULAS**
-• Circle Area = πr²
-• Circle Circumference = 2πr
-• Triangle Area = ½ × base × height
-• Rectangle Area = length × width
-• Volume of cube = side³""",
-            
-            # History
-            "world war": """📜 **WORLD WAR II (1939-1945)**
-**Allies:** USA, UK, USSR, France, China
-**Axis:** Germany, Italy, Japan
-
-**Key Events:**
-• 1939: Germany invades Poland
-• 1941: Pearl Harbor attack
-• 1944: D-Day invasion
-• 1945: Atomic bombs, war ends
-
-**Aftermath:** UN formed, Cold War began""",
-            
-            # Programming
-            "python": """🐍 **PYTHON PROGRAMMING**
-```python
-# Variables
-name = "Student"
-age = 16
-
-# Functions
-def greet(name):
-    return f"Hello, {name}!"
-
-# Lists
-numbers = [1, 2, 3, 4, 5]
-
-# Loops
-for i in range(5):
-    print(i)
-```"""
-        }
         
         # Search for keywords
-        question_lower = question.lower()
-        for keyword, answer in knowledge_base.items():
-            if keyword in question_lower:
-                return answer
+        answer = self.knowledge.lookup(question, subject)
+        if answer:
+            OFFLINE_ANSWERS.inc(fallback="keyword")
+            current_span().set_attribute("fallback", "keyword")
+            return answer
         
         # Subject-based responses
-        subject_responses = {
-            "math": """🧮 **Math Study Strategy:**
-1. Understand formulas
-2. Practice with examples
-3. Show all steps
-4. Check your work
-5. Learn from mistakes""",
-            
-            "science": """🔬 **Scientific Method:**
-1. Observe
-2. Question
-3. Hypothesize
-4. Experiment
-5. Analyze
-6. Conclude""",
-            
-            "history": """📜 **Historical Analysis:**
-• When did it happen?
-• Why did it happen?
-• What occurred?
-• What were effects?
-• Why does it matter?""",
-            
-            "english": """📖 **Writing Guide:**
-Introduction → Body → Conclusion
-Use clear thesis, evidence, analysis.
-Check grammar and spelling."""
-        }
+        answer = self.knowledge.subject_response(subject)
+        if answer:
+            OFFLINE_ANSWERS.inc(fallback="subject")
+            current_span().set_attribute("fallback", "subject")
+            return answer
         
-        if subject and subject.lower() in subject_responses:
-            return subject_responses[subject.lower()]
+        OFFLINE_ANSWERS.inc(fallback="generic")
+        current_span().set_attribute("fallback", "generic")
         
         # Smart generic response
         tips = [
@@ -236,6 +820,14 @@ Check grammar and spelling."""
     
     def generate_flashcards(self, topic, count=5):
         """Generate flashcards using available AI"""
+        with tracer.span("generate_flashcards", topic=topic, count=count) as span:
+            cards, source = self._generate_flashcards(topic, count)
+            FLASHCARD_SETS.inc(source=source)
+            span.set_attribute("source", source)
+            return cards
+    
+    def _generate_flashcards(self, topic, count):
+        """Return (cards, source), falling back provider by provider to local templates"""
         prompt = f"""Create {count} study flashcards about '{topic}' for students.
         Each flashcard should have:
         - A clear question
@@ -245,33 +837,79 @@ Check grammar and spelling."""
         
         Format as JSON array with these keys: question, answer, difficulty, category"""
         
-        # Try Gemini
-        if "gemini" in self.available_services:
-            try:
-                import google.generativeai as genai
-                response = self.gemini_model.generate_content(prompt)
-                return json.loads(response.text)
-            except:
-                pass
-        
-        # Try DeepSeek
-        if "deepseek" in self.available_services:
-            try:
-                url = "https://api.deepseek.com/v1/chat/completions"
-                headers = {"Authorization": f"Bearer {self.deepseek_key}"}
-                data = {
-                    "model": "deepseek-chat",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 2000
-                }
-                response = requests.post(url, headers=headers, json=data)
-                result = response.json()
-                return json.loads(result['choices'][0]['message']['content'])
-            except:
-                pass
+        for service in ("gemini", "deepseek"):
+            if service not in self.available_services:
+                continue
+            reply = self._flashcard_reply(service, prompt)
+            cards = self._parse_flashcards(service, reply) if reply else None
+            if cards is not None:
+                return cards, service
         
         # Fallback to local generation
-        return self._local_flashcards(topic, count)
+        with tracer.span("flashcards.local"):
+            return self._local_flashcards(topic, count), "local"
+    
+    def _flashcard_reply(self, service, prompt):
+        """Ask one provider for flashcards, moving on to its next key if one is rejected.
+        
+        Returns a callable giving the reply text, or None if the provider failed.
+        """
+        with tracer.span(f"provider.{service}", provider=service, operation="flashcards") as span:
+            span.set_attribute("outcome", "skipped")
+            for attempt in range(max(1, len(self.key_pools[service]))):
+                key = self._claim(service, BACKGROUND)
+                if key is None:
+                    return None
+                span.set_attribute("key", key.key_id)
+                span.set_attribute("attempts", attempt + 1)
+                start = time.perf_counter()
+                try:
+                    reply = self._request_flashcards(service, key, prompt)
+                except Exception as e:
+                    span.record_exception(e)
+                    span.set_attribute("outcome", "error")
+                    PROVIDER_ERRORS.inc(provider=service, error=type(e).__name__)
+                    if self._record_outcome(service, key, start, e, operation="flashcards") != KEY_ERROR:
+                        return None
+                    continue
+                span.set_attribute("outcome", "ok")
+                self._record_outcome(service, key, start, operation="flashcards")
+                return reply
+            return None
+    
+    def _request_flashcards(self, service, key, prompt):
+        """Send the flashcard prompt with one key; returns a callable for the reply text"""
+        if service == "gemini":
+            response = self._gemini_model(key).generate_content(prompt)
+            self._record_tokens("gemini", "flashcards", getattr(response, "usage_metadata", None))
+            return lambda: response.text
+        
+        url = "https://api.deepseek.com/v1/chat/completions"
+        headers = {"Authorization": f"Bearer {key.value}"}
+        data = {
+            "model": "deepseek-chat",
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": 2000
+        }
+        response = self.http.post(url, headers=headers, json=data)
+        response.raise_for_status()
+        result = response.json()
+        self._record_tokens("deepseek", "flashcards", result.get('usage'))
+        return lambda: result['choices'][0]['message']['content']
+    
+    def _parse_flashcards(self, provider, reply):
+        """Parse a provider's JSON flashcard reply; None (and a counted failure) if it isn't JSON"""
+        with tracer.span("flashcards.parse", provider=provider) as span:
+            try:
+                text = reply()
+                span.set_attribute("chars", len(text))
+                cards = json.loads(text)
+            except Exception as e:
+                span.set_error(f"{type(e).__name__}: {str(e)[:200]}")
+                FLASHCARD_PARSE_FAILURES.inc(provider=provider)
+                return None
+            span.set_attribute("cards", len(cards) if isinstance(cards, list) else 0)
+            return cards
     
     def _local_flashcards(self, topic, count):
         """Generate local flashcards without AI"""
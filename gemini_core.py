@@ -1,6 +1,6 @@
 # modules/gemini_core.py
-import google.generativeai as genai
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,14 +8,25 @@ load_dotenv()
 class GeminiAssistant:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY", "")
+        self._model = None
+        self._model_lock = threading.Lock()
         if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
+            # The SDK is imported and the model built on first use
             self.use_gemini = True
         else:
             self.use_gemini = False
             print("⚠️ Gemini API key not found. Using mock responses.")
     
+    @property
+    def model(self):
+        if self._model is None and self.use_gemini:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel('gemini-pro')
+        return self._model
+    
     def ask_question(self, question):
         if self.use_gemini:
             try:
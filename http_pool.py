@@ -0,0 +1,153 @@
+# modules/http_pool.py
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Responses worth retrying: a transient server failure. 429s go back to the
+# caller, which pauses that key in the rate limiter and tries another key.
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# Connect time spent by the current thread's request
+_timing = threading.local()
+
+
+def _timed_connect(connect):
+    """Wrap a connection's connect() so TCP+TLS setup time is recorded"""
+    def wrapper(self):
+        start = time.perf_counter()
+        try:
+            return connect(self)
+        finally:
+            _timing.connect = getattr(_timing, "connect", 0.0) + time.perf_counter() - start
+            _timing.new_connections = getattr(_timing, "new_connections", 0) + 1
+    return wrapper
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    connect = _timed_connect(HTTPConnection.connect)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    connect = _timed_connect(HTTPSConnection.connect)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class PooledHTTPClient:
+    """Shared keep-alive connection pool with retries and latency accounting"""
+
+    def __init__(self, pool_size=10, keep_alive=True, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # urllib3's pool is thread-safe; one session is shared by all callers
+        self.session = requests.Session()
+        adapter = _TimedAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "new_connections": 0,
+            "connect_seconds": 0.0,
+            "server_seconds": 0.0,
+        }
+
+    def post(self, url, **kwargs):
+        """POST, retrying 5xx responses and failed connections"""
+        for attempt in range(self.max_retries + 1):
+            _timing.connect = 0.0
+            _timing.new_connections = 0
+            start = time.perf_counter()
+
+            try:
+                response = self.session.post(url, **kwargs)
+            except requests.ConnectionError:
+                if attempt == self.max_retries:
+                    raise
+                self._count_retry()
+                time.sleep(self._backoff(attempt))
+                continue
+
+            # With stream=True this is time to response headers
+            self._record(time.perf_counter() - start)
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                response.close()
+                self._count_retry()
+                time.sleep(delay)
+                continue
+
+            return response
+
+    def warm(self, url, timeout=5):
+        """Open a keep-alive connection to url's host so the first real request reuses it"""
+        try:
+            self.session.head(url, timeout=timeout).close()
+            return True
+        except requests.RequestException:
+            return False
+
+    def get_stats(self):
+        """Return request counts and the connect vs. server time split"""
+        with self._lock:
+            stats = dict(self.stats)
+        requests_made = stats["requests"] or 1
+        stats["avg_connect_ms"] = stats["connect_seconds"] / requests_made * 1000
+        stats["avg_server_ms"] = stats["server_seconds"] / requests_made * 1000
+        stats["connection_reuse_rate"] = (
+            1 - stats["new_connections"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        return stats
+
+    def close(self):
+        self.session.close()
+
+    def _backoff(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, honouring Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return min(delay, self.backoff_max)
+
+    def _record(self, elapsed):
+        connect = min(_timing.connect, elapsed)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["new_connections"] += _timing.new_connections
+            self.stats["connect_seconds"] += connect
+            self.stats["server_seconds"] += elapsed - connect
+
+    def _count_retry(self):
+        with self._lock:
+            self.stats["retries"] += 1
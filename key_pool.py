@@ -0,0 +1,151 @@
+# modules/key_pool.py
+import os
+import threading
+import time
+
+ACTIVE = "active"
+EXHAUSTED = "exhausted"
+REVOKED = "revoked"
+
+# Error text that means a key will never work again
+REVOKED_MARKERS = ("401", "403", "api key not valid", "invalid api key", "permission denied", "unauthorized")
+# Error text that means a key is out of quota for now
+EXHAUSTED_MARKERS = ("429", "quota", "resource has been exhausted", "too many requests")
+
+# Who a failed call is down to (see error_scope)
+KEY_ERROR = "key"            # auth or quota: try another key
+PROVIDER_ERROR = "provider"  # transport failure or 5xx: counts against the provider
+REQUEST_ERROR = "request"    # anything else the provider rejected (bad request, bad reply)
+
+
+def error_scope(error):
+    """Classify a failed call by what it says about the key and the provider"""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) if response is not None else None
+    if status is None and isinstance(getattr(error, "code", None), int):
+        status = error.code  # google.api_core errors carry the HTTP status here
+    if isinstance(status, int):
+        if status in (401, 403, 429):
+            return KEY_ERROR
+        return PROVIDER_ERROR if status >= 500 else REQUEST_ERROR
+
+    message = str(error or "").lower()
+    if any(marker in message for marker in REVOKED_MARKERS + EXHAUSTED_MARKERS):
+        return KEY_ERROR
+    # Timeouts, refused connections and anything unrecognised
+    return PROVIDER_ERROR
+
+
+def keys_from_env(prefix):
+    """Read PREFIX_API_KEYS (comma separated) plus PREFIX_API_KEY, without duplicates"""
+    keys = [k.strip() for k in os.getenv(f"{prefix}_API_KEYS", "").split(",")]
+    keys.append(os.getenv(f"{prefix}_API_KEY", "").strip())
+
+    unique = []
+    for key in keys:
+        if key and key not in unique:
+            unique.append(key)
+    return unique
+
+
+class APIKey:
+    """One provider key and its usage"""
+
+    def __init__(self, provider, value, index):
+        self.provider = provider
+        self.value = value
+        self.key_id = f"{provider}#{index}"
+        self.state = ACTIVE
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.last_used = None
+        self.last_error = None
+
+    @property
+    def masked(self):
+        return f"…{self.value[-4:]}" if len(self.value) > 4 else "…"
+
+
+class KeyPool:
+    """Spread one provider's requests across several API keys.
+
+    The key with the most remaining rate-limit tokens is chosen. Keys that
+    run out of quota cool down for a while; keys the provider rejects as
+    invalid are evicted for good.
+    """
+
+    def __init__(self, provider, values, rate_limiter=None, cooldown=60.0):
+        self.provider = provider
+        self.rate_limiter = rate_limiter
+        self.cooldown = cooldown
+        self.keys = [APIKey(provider, value, i + 1) for i, value in enumerate(values)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def choose(self):
+        """Return the best key to use now, or None if every key is unusable"""
+        now = time.monotonic()
+        with self._lock:
+            usable = []
+            for key in self.keys:
+                if key.state == EXHAUSTED and now >= key.cooldown_until:
+                    key.state = ACTIVE
+                if key.state == ACTIVE:
+                    usable.append(key)
+            if not usable:
+                return None
+
+            return max(usable, key=lambda k: (self._remaining(k), -k.requests))
+
+    def report_success(self, key):
+        with self._lock:
+            key.requests += 1
+            key.last_used = time.time()
+
+    def report_failure(self, key, error):
+        """Count a failed call and evict or cool down the key if it is the cause"""
+        message = str(error or "").lower()
+        with self._lock:
+            key.requests += 1
+            key.failures += 1
+            key.last_used = time.time()
+            key.last_error = str(error)[:100] if error else None
+
+            if any(marker in message for marker in REVOKED_MARKERS):
+                key.state = REVOKED
+                print(f"🔑 {self.provider} key {key.masked} rejected; removed from rotation")
+            elif any(marker in message for marker in EXHAUSTED_MARKERS):
+                key.state = EXHAUSTED
+                key.cooldown_until = time.monotonic() + self.cooldown
+
+    def has_usable_key(self):
+        now = time.monotonic()
+        with self._lock:
+            return any(
+                key.state == ACTIVE or (key.state == EXHAUSTED and now >= key.cooldown_until)
+                for key in self.keys
+            )
+
+    def snapshot(self):
+        """Return per-key usage without exposing the key values"""
+        with self._lock:
+            return [
+                {
+                    "key": key.masked,
+                    "key_id": key.key_id,
+                    "state": key.state,
+                    "requests": key.requests,
+                    "failures": key.failures,
+                    "remaining": self._remaining(key),
+                    "last_error": key.last_error,
+                }
+                for key in self.keys
+            ]
+
+    def _remaining(self, key):
+        if self.rate_limiter is None:
+            return 0.0
+        return self.rate_limiter.remaining(self.provider, key.key_id)
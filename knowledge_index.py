@@ -0,0 +1,128 @@
+# modules/knowledge_index.py
+import json
+import threading
+from collections import deque
+from pathlib import Path
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+
+# Shipped knowledge next to this module; students/teachers can add more in data/knowledge
+BUILTIN_KNOWLEDGE_DIR = Path(__file__).parent / "knowledge"
+USER_KNOWLEDGE_DIR = DATA_DIR / "knowledge"
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: one pass over the text finds every keyword"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+    def add(self, pattern, value):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(value)
+
+    def build(self):
+        """Compute failure links breadth-first"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text):
+        """Yield the value of every pattern occurring in text"""
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            yield from self._output[node]
+
+
+class KnowledgeBase:
+    """Offline answers compiled once into a keyword matcher"""
+
+    def __init__(self, entries, subjects):
+        self.entries = entries
+        self.subjects = {name.lower(): answer for name, answer in subjects.items()}
+
+        self._matcher = AhoCorasick()
+        for index, entry in enumerate(entries):
+            for keyword in entry["keywords"]:
+                self._matcher.add(keyword.lower(), (index, keyword.lower()))
+        self._matcher.build()
+
+    @classmethod
+    def from_directories(cls, directories):
+        """Load every *.json file ({"entries": [...], "subjects": {...}}) in order"""
+        entries, subjects = [], {}
+        for directory in directories:
+            if not Path(directory).exists():
+                continue
+            for path in sorted(Path(directory).glob("*.json")):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Skipping knowledge file {path.name}: {e}")
+                    continue
+                entries.extend(data.get("entries", []))
+                subjects.update(data.get("subjects", {}))
+        return cls(entries, subjects)
+
+    def lookup(self, question, subject=None):
+        """Return the most specific matching answer, or None.
+
+        Entries are ranked by their longest matched keyword, then by how many
+        of their keywords matched, then by whether they belong to the subject.
+        """
+        matched = {}
+        for index, keyword in self._matcher.find(question.lower()):
+            matched.setdefault(index, set()).add(keyword)
+        if not matched:
+            return None
+
+        subject = (subject or "").lower()
+
+        def rank(index):
+            keywords = matched[index]
+            in_subject = self.entries[index].get("subject", "").lower() == subject
+            return (max(len(k) for k in keywords), len(keywords), in_subject, -index)
+
+        return self.entries[max(matched, key=rank)]["answer"]
+
+    def subject_response(self, subject):
+        if not subject:
+            return None
+        return self.subjects.get(subject.lower())
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def load_knowledge_base():
+    """Return the process-wide knowledge base, compiling it on first use"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = KnowledgeBase.from_directories([BUILTIN_KNOWLEDGE_DIR, USER_KNOWLEDGE_DIR])
+        return _default
@@ -0,0 +1,174 @@
+# modules/lazy_deck.py
+import json
+import os
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+
+INDEX_SUFFIX = ".idx"
+
+
+def iter_cards(path, chunk_size=1 << 16):
+    """Stream cards from a .jsonl deck or a JSON array without loading the whole file"""
+    path = str(path)
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        started = False
+        while True:
+            chunk = f.read(chunk_size)
+            buffer += chunk
+            position = 0
+            while True:
+                # Skip the separators between array items
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if not started and position < len(buffer):
+                    if buffer[position] != "[":
+                        raise ValueError("Flashcard file must contain a JSON array")
+                    started = True
+                    position += 1
+                    continue
+                if position < len(buffer) and buffer[position] == "]":
+                    return
+                try:
+                    card, end = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    break  # Item continues in the next chunk
+                yield card
+                position = end
+            buffer = buffer[position:]
+            if not chunk:
+                if buffer.strip():
+                    raise ValueError("Truncated flashcard file")
+                return
+
+
+def _index_id(card, position):
+    """A card's id for the offset index; cards without an integer id are keyed by 1-based position"""
+    try:
+        return int(card.get("id", position + 1))
+    except (TypeError, ValueError):
+        return position + 1
+
+
+def write_jsonl_deck(path, cards):
+    """Write cards one per line plus a sidecar offset index; returns (count, first card)"""
+    offsets, ids = array("Q"), array("q")
+    first = None
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for card in cards:
+            if first is None:
+                first = card
+            offsets.append(f.tell())
+            ids.append(_index_id(card, len(ids)))
+            f.write(json.dumps(card, ensure_ascii=False).encode("utf-8") + b"\n")
+    os.replace(tmp_path, path)
+    _write_index(path, offsets, ids)
+    return len(offsets), first
+
+
+def _write_index(path, offsets, ids):
+    """Index layout: count, offsets[count], sorted ids[count], positions[count]"""
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    sorted_ids = array("q", (ids[i] for i in order))
+    positions = array("Q", order)
+    tmp_path = f"{path}{INDEX_SUFFIX}.tmp"
+    with open(tmp_path, "wb") as f:
+        array("Q", [len(offsets)]).tofile(f)
+        offsets.tofile(f)
+        sorted_ids.tofile(f)
+        positions.tofile(f)
+    os.replace(tmp_path, f"{path}{INDEX_SUFFIX}")
+
+
+class JSONLDeck(Sequence):
+    """Read-only deck backed by a .jsonl file; cards are read from disk on demand.
+
+    The file is opened per read rather than held open, so a deck dropped from
+    a cache (or still shared by another session) never leaks a handle.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._load_index()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._read(range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("card index out of range")
+        return self._read([index])[0]
+
+    def __iter__(self):
+        yield from iter_cards(self.path)
+
+    def page(self, offset, limit):
+        """Return up to limit cards starting at position offset"""
+        return self[offset:offset + limit]
+
+    def get_by_id(self, card_id):
+        """Random access by card id via the sorted id index (see _index_id)"""
+        try:
+            card_id = int(card_id)
+        except (TypeError, ValueError):
+            return None
+        i = bisect_left(self._ids, card_id)
+        if i < len(self._ids) and self._ids[i] == card_id:
+            return self[self._positions[i]]
+        return None
+
+    def close(self):
+        pass
+
+    def _read(self, positions):
+        """Read the cards at the given positions with one open of the file"""
+        if not positions:
+            return []
+        with open(self.path, "rb") as f:
+            cards = []
+            for position in positions:
+                f.seek(self._offsets[position])
+                cards.append(json.loads(f.readline()))
+            return cards
+
+    def _load_index(self):
+        """Load the offset index, rebuilding it if missing or older than the deck"""
+        index_path = self.path + INDEX_SUFFIX
+        if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(self.path):
+            self._rebuild_index()
+
+        with open(index_path, "rb") as f:
+            header = array("Q")
+            header.fromfile(f, 1)
+            count = header[0]
+            self._offsets, self._ids, self._positions = array("Q"), array("q"), array("Q")
+            self._offsets.fromfile(f, count)
+            self._ids.fromfile(f, count)
+            self._positions.fromfile(f, count)
+
+    def _rebuild_index(self):
+        offsets, ids = array("Q"), array("q")
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if line.strip():
+                    offsets.append(offset)
+                    ids.append(_index_id(json.loads(line), len(ids)))
+        _write_index(self.path, offsets, ids)
@@ -5,6 +5,12 @@ Main Student Chatbot Application
 Run with: python main.py
 """
 
+import time
+
+# Cold-start clock: measured from before the heavy imports below
+_START_TIME = time.perf_counter()
+
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -19,9 +25,12 @@ FLASHCARDS_DIR = DATA_DIR / "flashcards"
 HOMEWORK_DIR = DATA_DIR / "homework_scans"
 USER_DATA_DIR = DATA_DIR / "user_data"
 
+# Seconds from launch to the main menu that we aim to stay under
+STARTUP_TARGET_SECONDS = float(os.getenv("STARTUP_TARGET_SECONDS", "2.0"))
+
 from modules.free_ai_core import FreeStudentAI
 from modules.flashcard_generator import FlashcardSystem
-from modules.module_verifier import check_installation
+from modules.module_verifier import check_installation, check_system
 
 class StudentChatbotApp:
     def __init__(self):
@@ -33,10 +42,14 @@ class StudentChatbotApp:
         print("="*60)
         print("Loading modules...")
         
-        # Check installation
+        # Check installation (locates packages without importing them; see --diagnose)
         if not check_installation():
             print("\n⚠️  Some dependencies might be missing.")
             print("Run: pip install -r requirements.txt")
+        
+        startup = time.perf_counter() - _START_TIME
+        status = "✅" if startup <= STARTUP_TARGET_SECONDS else "⚠️ "
+        print(f"{status} Started in {startup:.2f}s (target {STARTUP_TARGET_SECONDS:.1f}s)")
     
     def display_menu(self):
         print("\n" + "="*60)
@@ -76,16 +89,18 @@ class StudentChatbotApp:
                 
                 print("\n🤖 AI Tutor: ", end="")
                 
-                # Get AI response
-                response = self.ai.ask_question(question)
-                
-                # Print with typewriter effect
-                import time
-                for char in response:
-                    print(char, end="", flush=True)
-                    time.sleep(0.01)
+                # Print the answer as it streams in
+                for chunk in self.ai.ask_question_stream(question):
+                    print(chunk, end="", flush=True)
                 print()
                 
+                if self.ai.last_source == "semantic_cache":
+                    match = self.ai.last_match
+                    print(f"⚡ From semantic cache (similar to: \"{match['question']}\", "
+                          f"similarity {match['score']:.2f})")
+                elif self.ai.last_source == "cache":
+                    print("⚡ From answer cache")
+                
                 print("-"*40)
                 
             except KeyboardInterrupt:
@@ -166,20 +181,29 @@ class StudentChatbotApp:
         check_api_keys()
         
         # Count flashcards
-        flashcard_files = list(FLASHCARDS_DIR.glob("*.json"))
+        saved_sets = self.flashcard_sys.list_saved_sets()
         print(f"\n📊 Statistics:")
-        print(f"  • Flashcard sets: {len(flashcard_files)}")
+        print(f"  • Flashcard sets: {len(saved_sets)}")
         print(f"  • Total flashcards in memory: {len(self.flashcard_sys.flashcards)}")
+        history = self.flashcard_sys.history.get_stats()
+        print(f"  • Cards reviewed: {history['reviews']} ({history['accuracy'] * 100:.0f}% correct)")
+        print(f"  • Study streak: {history['current_streak']} days (longest {history['longest_streak']})")
+        
+        metrics = self.ai.get_metrics()
+        if metrics['questions']:
+            print(f"  • Questions this session: {metrics['questions']} "
+                  f"({metrics['offline_rate'] * 100:.0f}% answered offline)")
+        for name, p in metrics['providers'].items():
+            print(f"  • {name}: {p['calls']} calls, {p['error_rate'] * 100:.0f}% errors, "
+                  f"p95 {p['p95_seconds']:.1f}s, {p['prompt_tokens'] + p['completion_tokens']} tokens")
         
         # Show saved sets
-        if hasattr(self.flashcard_sys, 'list_saved_sets'):
-            saved_sets = self.flashcard_sys.list_saved_sets()
-            if saved_sets:
-                print(f"\n📁 Saved flashcard sets:")
-                for s in saved_sets[:5]:  # Show first 5
-                    print(f"  • {s['filename']} - {s['count']} cards ({s['topic']})")
-                if len(saved_sets) > 5:
-                    print(f"  ... and {len(saved_sets) - 5} more")
+        if saved_sets:
+            print(f"\n📁 Saved flashcard sets:")
+            for s in saved_sets[:5]:  # Show first 5
+                print(f"  • {s['filename']} - {s['count']} cards ({s['topic']})")
+            if len(saved_sets) > 5:
+                print(f"  ... and {len(saved_sets) - 5} more")
     
     def show_help(self):
         print("\n" + "="*60)
@@ -250,6 +274,13 @@ class StudentChatbotApp:
             input("\nPress Enter to continue...")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Student AI Chatbot")
+    parser.add_argument("--diagnose", action="store_true",
+                        help="run full diagnostics, importing every dependency, then exit")
+    args = parser.parse_args()
+    if args.diagnose:
+        sys.exit(0 if check_system(full=True) else 1)
+    
     # Ensure data directories exist
     for directory in [DATA_DIR, FLASHCARDS_DIR, HOMEWORK_DIR, USER_DATA_DIR]:
         directory.mkdir(exist_ok=True)
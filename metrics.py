@@ -0,0 +1,233 @@
+# modules/metrics.py
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers cache hits (ms) up to slow free-tier calls near the 30s timeout
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Metric:
+    """Base for a metric family: one value per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def label_values(self, labelname):
+        """Every value seen for one label"""
+        index = self.labelnames.index(labelname)
+        with self._lock:
+            return sorted({key[index] for key in self._values})
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """Value for the given labels, summed over any label left out"""
+        with self._lock:
+            return sum(value for key, value in self._values.items() if self._matches(key, labels))
+
+    def by(self, labelname, **labels):
+        """{label value: total} for one label, optionally filtered by others"""
+        index = self.labelnames.index(labelname)
+        totals = {}
+        with self._lock:
+            for key, value in self._values.items():
+                if self._matches(key, labels):
+                    totals[key[index]] = totals.get(key[index], 0) + value
+        return totals
+
+    def _matches(self, key, labels):
+        return all(key[self.labelnames.index(name)] == str(value) for name, value in labels.items())
+
+    def _render_samples(self, items):
+        for key, value in items:
+            yield f"{self.name}{self._format_labels(key)} {value}"
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, as Prometheus expects"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Context manager that observes the seconds spent in its block"""
+        return _Timer(self, labels)
+
+    def summary(self, **labels):
+        """count, sum, mean, p50 and p95 over every series matching labels"""
+        counts = [0] * (len(self.buckets) + 1)
+        total, count = 0.0, 0
+        with self._lock:
+            for key, (bucket_counts, series_sum, series_count) in self._values.items():
+                if all(key[self.labelnames.index(name)] == str(value) for name, value in labels.items()):
+                    counts = [a + b for a, b in zip(counts, bucket_counts)]
+                    total += series_sum
+                    count += series_count
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "p50": self._quantile(0.5, counts, count),
+            "p95": self._quantile(0.95, counts, count),
+        }
+
+    def _quantile(self, q, counts, count):
+        """Interpolate within the bucket holding the q-th observation (like histogram_quantile)"""
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]  # Beyond the last bound; report the bound
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def _render_samples(self, items):
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{self._format_labels(key)} {total}"
+            yield f"{self.name}_count{self._format_labels(key)} {count}"
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Named counters and histograms, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, cls, name, help_text, labelnames, **kwargs):
+        # Re-registering returns the existing metric, so modules can be reloaded
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+
+
+REGISTRY = MetricsRegistry()
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve registry at http://host:port/metrics from a daemon thread (once per process)"""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        try:
+            _server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"⚠️  Metrics endpoint not started on port {port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"📈 Metrics: http://{host}:{port}/metrics")
+        return _server
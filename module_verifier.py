@@ -1,9 +1,37 @@
 # modules/module_verifier.py
+import argparse
+import hashlib
 import importlib
+import importlib.util
+import json
+import subprocess
 import sys
 import os
+from datetime import datetime
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+PROBE_CACHE_PATH = DATA_DIR / "cache" / "module_probe.json"
+STARTUP_PROFILE_PATH = DATA_DIR / "cache" / "startup_profile.json"
+
+REQUIRED_MODULES = [
+    "streamlit",
+    "openai",
+    "telegram",
+    "flask",
+    "PIL",
+    "pytesseract",
+    "pandas",
+    "numpy",
+    "fpdf",
+    "dotenv",
+    "transformers",
+    "torch"
+]
+
 # STEP 1: Load environment variables from .env file
 load_dotenv()
 
@@ -12,35 +40,82 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 
 
-def check_installation(verbose=False):
-    """Check if all required modules are installed"""
-    required = [
-        "streamlit",
-        "openai",
-        "telegram",
-        "flask",
-        "PIL",
-        "pytesseract",
-        "pandas",
-        "numpy",
-        "fpdf",
-        "dotenv",
-        "transformers",
-        "torch"
-    ]
-    
-    print("🔍 Checking Python modules...")
-    print("-" * 40)
-    
-    missing = []
-    for module in required:
+def environment_key():
+    """Fingerprint of the interpreter and its package directories.
+
+    Installing or removing a package changes the mtime of the directory it
+    lives in, which changes the key and invalidates cached probe results.
+    """
+    parts = [sys.executable, sys.version]
+    for entry in sys.path:
+        try:
+            parts.append(f"{entry}:{os.stat(entry or '.').st_mtime_ns}")
+        except OSError:
+            continue
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def probe_modules(modules=REQUIRED_MODULES, use_cache=True):
+    """Report which top-level modules are installed without importing them"""
+    key = environment_key()
+    cache = {}
+    if use_cache:
+        try:
+            with open(PROBE_CACHE_PATH, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        if cache.get("key") == key and all(m in cache.get("results", {}) for m in modules):
+            return {m: cache["results"][m] for m in modules}
+
+    # find_spec only locates the package on disk; nothing is executed
+    results = {}
+    for module in modules:
+        try:
+            results[module] = importlib.util.find_spec(module) is not None
+        except (ImportError, ValueError):
+            results[module] = False
+
+    if use_cache:
+        try:
+            PROBE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = PROBE_CACHE_PATH.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"key": key, "results": results}, f)
+            os.replace(tmp_path, PROBE_CACHE_PATH)
+        except OSError:
+            pass
+    return results
+
+
+def import_modules(modules=REQUIRED_MODULES):
+    """Really import each module (slow: loads torch, transformers, ...)"""
+    results = {}
+    for module in modules:
         try:
             importlib.import_module(module if module != "PIL" else "PIL.Image")
-            if verbose:
-                print(f"✅ {module}")
+            results[module] = True
         except ImportError:
-            if verbose:
-                print(f"❌ {module}")
+            results[module] = False
+    return results
+
+
+def check_installation(verbose=False, full=False):
+    """Check if all required modules are installed.
+
+    By default modules are only located on disk (cached per environment);
+    full=True imports each one to catch broken installs.
+    """
+    print("🔍 Checking Python modules..." + (" (importing each one)" if full else ""))
+    if verbose:
+        print("-" * 40)
+    
+    results = import_modules() if full else probe_modules()
+    missing = []
+    for module, installed in results.items():
+        if verbose:
+            print(f"{'✅' if installed else '❌'} {module}")
+        if not installed:
             missing.append(module)
     
     if verbose:
@@ -70,7 +145,7 @@ def check_api_keys():
     
     print("-" * 40)
 
-def check_system():
+def check_system(full=False):
     """Complete system check"""
     print("\n" + "="*50)
     print("SYSTEM DIAGNOSTICS")
@@ -80,7 +155,7 @@ def check_system():
     print(f"Python: {sys.version}")
     
     # Check installation
-    modules_ok = check_installation(verbose=True)
+    modules_ok = check_installation(verbose=True, full=full)
     
     # Check API keys
     check_api_keys()
@@ -96,6 +171,127 @@ def check_system():
     print("\n" + "="*50)
     return modules_ok
 
+# Runs in a fresh interpreter (started with -X importtime) so nothing is preloaded
+PROFILE_SCRIPT = """
+import importlib, json, time, tracemalloc
+result = {"imports": {}, "constructors": {}}
+
+for name in ["modules.free_ai_core", "modules.flashcard_generator"] + EXTRA_IMPORTS:
+    start = time.perf_counter()
+    importlib.import_module(name)
+    result["imports"][name] = time.perf_counter() - start
+
+from modules.free_ai_core import FreeStudentAI
+from modules.flashcard_generator import FlashcardSystem
+# Traced only from here on: tracing slows imports down and would skew their timings
+tracemalloc.start()
+# No background warm-up: it is off the startup path and would muddy the memory numbers
+for cls, kwargs in ((FreeStudentAI, {"warm_up": False}), (FlashcardSystem, {})):
+    start = time.perf_counter()
+    cls(**kwargs)
+    result["constructors"][cls.__name__] = time.perf_counter() - start
+
+result["constructor_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+try:
+    import resource, sys
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_bytes"] = rss if sys.platform == "darwin" else rss * 1024
+except ImportError:
+    result["peak_rss_bytes"] = None
+print("STARTUP_PROFILE " + json.dumps(result))
+"""
+
+
+def parse_importtime(stderr):
+    """Turn -X importtime output into {module: (self_us, cumulative_us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def profile_startup(output=STARTUP_PROFILE_PATH, top=20, baseline=None):
+    """Profile imports, constructors and peak memory of a cold start.
+
+    Prints a report sorted by cost and writes it as JSON to output, so runs
+    can be compared between releases (pass an earlier file as baseline).
+    """
+    extra = [m for m in ("streamlit",) if probe_modules([m]).get(m)]
+    script = PROFILE_SCRIPT.replace("EXTRA_IMPORTS", repr(extra))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=str(BASE_DIR), capture_output=True, text=True
+    )
+    marker = [line for line in proc.stdout.splitlines() if line.startswith("STARTUP_PROFILE ")]
+    if proc.returncode != 0 or not marker:
+        print("❌ Startup profile failed:")
+        print(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output")
+        return None
+    result = json.loads(marker[-1][len("STARTUP_PROFILE "):])
+
+    imports = parse_importtime(proc.stderr)
+    slowest = sorted(imports.items(), key=lambda item: -item[1][1])[:top]
+    profile = {
+        "created": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "total_seconds": sum(result["imports"].values()) + sum(result["constructors"].values()),
+        "imports": result["imports"],
+        "constructors": result["constructors"],
+        "constructor_peak_bytes": result["constructor_peak_bytes"],
+        "peak_rss_bytes": result["peak_rss_bytes"],
+        "modules": [
+            {"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+            for name, (self_us, cumulative_us) in slowest
+        ],
+    }
+
+    print("\n" + "="*50)
+    print("⏱️  STARTUP PROFILE")
+    print("="*50)
+    print(f"Total: {profile['total_seconds']:.2f}s")
+    for name, seconds in sorted({**profile['imports'], **profile['constructors']}.items(), key=lambda i: -i[1]):
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+    print(f"\nSlowest imports (cumulative / self):")
+    for module in profile['modules']:
+        print(f"  {module['cumulative_ms']:8.1f} / {module['self_ms']:7.1f} ms  {module['module']}")
+    print(f"\nPeak allocations in constructors: {profile['constructor_peak_bytes'] / 2**20:.1f} MB")
+    if profile['peak_rss_bytes']:
+        print(f"Peak RSS: {profile['peak_rss_bytes'] / 2**20:.1f} MB")
+
+    if baseline:
+        try:
+            with open(baseline, 'r') as f:
+                before = json.load(f)
+            change = profile['total_seconds'] - before['total_seconds']
+            print(f"\n📈 vs {baseline}: {change * 1000:+.0f} ms total "
+                  f"({before['total_seconds']:.2f}s → {profile['total_seconds']:.2f}s)")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Could not read baseline {baseline}: {e}")
+
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(profile, f, indent=2)
+    print(f"\n💾 Saved profile to {output}")
+    return profile
+
+
 if __name__ == "__main__":
-    check_system()
+    parser = argparse.ArgumentParser(description="Student AI Assistant diagnostics")
+    parser.add_argument("--full", action="store_true",
+                        help="import every dependency instead of only locating it (slow)")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile import times, constructors and peak memory of a cold start")
+    parser.add_argument("--output", default=str(STARTUP_PROFILE_PATH), help="where --profile writes its JSON report")
+    parser.add_argument("--baseline", help="earlier --profile JSON report to compare against")
+    args = parser.parse_args()
+    if args.profile:
+        profile_startup(args.output, baseline=args.baseline)
+    else:
+        check_system(full=args.full)
     
@@ -0,0 +1,130 @@
+# modules/provider_health.py
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Error-rate and latency tracker for one provider, with a circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and the
+    provider is skipped. Once recovery_timeout has passed a single probe
+    request is let through (half-open); success closes the circuit again,
+    failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=3, recovery_timeout=30.0, window=50):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.total_calls = 0
+        self.last_error = None
+
+    def is_available(self):
+        """True if a call would currently be allowed (does not claim a probe)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.recovery_timeout
+            return not self.probe_in_flight
+
+    def allow_request(self):
+        """Claim permission to call the provider"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency):
+        with self._lock:
+            self._record(True, latency)
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+            self.state = CLOSED
+
+    def record_failure(self, latency, error=None):
+        with self._lock:
+            self._record(False, latency)
+            self.consecutive_failures += 1
+            self.last_error = str(error)[:100] if error else None
+            self.probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """The call said nothing about the provider's health (e.g. a bad key); let another probe through"""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def snapshot(self):
+        """Return the provider's current health as a plain dict"""
+        with self._lock:
+            outcomes = list(self._outcomes)
+            latencies = sorted(self._latencies)
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+            return {
+                "name": self.name,
+                "state": self.state,
+                "error_rate": outcomes.count(False) / len(outcomes) if outcomes else 0.0,
+                "p50_ms": _percentile(latencies, 0.50) * 1000,
+                "p95_ms": _percentile(latencies, 0.95) * 1000,
+                "consecutive_failures": self.consecutive_failures,
+                "total_calls": self.total_calls,
+                "last_error": self.last_error,
+                "retry_in": retry_in,
+            }
+
+    def _record(self, success, latency):
+        self._outcomes.append(success)
+        self._latencies.append(latency)
+        self.total_calls += 1
+
+
+class HealthTracker:
+    """Circuit breakers for every configured provider"""
+
+    def __init__(self, providers, failure_threshold=3, recovery_timeout=30.0):
+        self.breakers = {
+            name: CircuitBreaker(name, failure_threshold, recovery_timeout)
+            for name in providers
+        }
+
+    def get(self, name):
+        return self.breakers[name]
+
+    def available(self, providers):
+        """Filter providers down to the ones whose circuit lets calls through"""
+        return [p for p in providers if p in self.breakers and self.breakers[p].is_available()]
+
+    def snapshot(self):
+        return [breaker.snapshot() for breaker in self.breakers.values()]
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
@@ -0,0 +1,175 @@
+# modules/rate_limiter.py
+import heapq
+import itertools
+import threading
+import time
+
+# Request priorities: lower numbers are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # Set after a quota error: no tokens are issued before this time
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        self._refill()
+        return self.tokens >= 1 and time.monotonic() >= self.paused_until
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+    def wait_time(self):
+        """Seconds until one token is available"""
+        self._refill()
+        paused = max(0.0, self.paused_until - time.monotonic())
+        if self.tokens >= 1:
+            return paused
+        return max(paused, (1 - self.tokens) / self.rate)
+
+    def refund(self):
+        """Give back a token that was taken but not used"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def drain(self, pause_seconds=0.0):
+        """Empty the bucket and stop refilling it for pause_seconds, e.g. after a 429"""
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+        self.paused_until = max(self.paused_until, time.monotonic() + pause_seconds)
+
+
+class RateLimiter:
+    """Per-provider and per-key token buckets with a priority queue of waiters.
+
+    Each provider has its own queue, ordered by priority then arrival, so a
+    burst of requests from many web sessions is released at the quota rate
+    in a fair order and interactive questions overtake background work.
+    A waiter whose key is out of tokens (or paused after a quota error) does
+    not hold up waiters for the provider's other keys.
+    """
+
+    def __init__(self, provider_rpm, key_rpm=None, burst_seconds=5):
+        self.provider_rpm = provider_rpm
+        self.key_rpm = key_rpm or provider_rpm
+        self.burst_seconds = burst_seconds
+
+        self._cond = threading.Condition()
+        self._buckets = {}
+        self._queues = {}
+        self._sequence = itertools.count()
+        self.stats = {"granted": 0, "timed_out": 0, "waited_seconds": 0.0}
+
+    def acquire(self, provider, key_id=None, priority=INTERACTIVE, timeout=10.0):
+        """Block until the provider (and key) may be called; False on timeout"""
+        start = time.monotonic()
+        deadline = start + timeout
+        ticket = (priority, next(self._sequence), key_id)
+
+        with self._cond:
+            buckets = [self._bucket(provider, None)]
+            if key_id is not None:
+                buckets.append(self._bucket(provider, key_id))
+            queue = self._queues.setdefault(provider, [])
+            heapq.heappush(queue, ticket)
+
+            while True:
+                my_turn = self._my_turn(provider, queue, ticket)
+                if my_turn and all(bucket.available() for bucket in buckets):
+                    for bucket in buckets:
+                        bucket.consume()
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    self.stats["granted"] += 1
+                    self.stats["waited_seconds"] += time.monotonic() - start
+                    self._cond.notify_all()
+                    return True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    self.stats["timed_out"] += 1
+                    self._cond.notify_all()
+                    return False
+
+                if my_turn:
+                    wait = max(bucket.wait_time() for bucket in buckets)
+                else:
+                    wait = remaining
+                self._cond.wait(min(max(wait, 0.001), remaining))
+
+    def drain(self, provider, key_id=None, pause_seconds=60.0):
+        """Stop issuing tokens for a key (or the whole provider) after a quota error.
+
+        The bucket stays empty for pause_seconds (the provider's Retry-After,
+        or a quota window) instead of refilling at its normal rate.
+        """
+        with self._cond:
+            self._bucket(provider, key_id).drain(pause_seconds)
+            self._cond.notify_all()
+
+    def refund(self, provider, key_id=None):
+        """Return the tokens of an acquire() whose call was not made after all"""
+        with self._cond:
+            self._bucket(provider, None).refund()
+            if key_id is not None:
+                self._bucket(provider, key_id).refund()
+            self._cond.notify_all()
+
+    def remaining(self, provider, key_id=None):
+        """Tokens currently left in a key's (or the provider's) bucket"""
+        with self._cond:
+            bucket = self._bucket(provider, key_id)
+            bucket.available()
+            return bucket.tokens
+
+    def queue_depth(self, provider):
+        with self._cond:
+            return len(self._queues.get(provider, []))
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["queued"] = {provider: len(queue) for provider, queue in self._queues.items()}
+        return stats
+
+    def _my_turn(self, provider, queue, ticket):
+        """True if no waiter ahead of ticket could take the provider's next token.
+
+        Waiters ahead whose own key has no tokens are skipped: they cannot
+        use a provider token now, so healthy keys go first.
+        """
+        if queue[0] == ticket:
+            return True
+        for other in sorted(queue):
+            if other == ticket:
+                return True
+            other_key = other[2]
+            if other_key is None or self._bucket(provider, other_key).available():
+                return False
+        return True
+
+    def _bucket(self, provider, key_id):
+        """Create buckets lazily; the provider bucket uses key_id None"""
+        bucket = self._buckets.get((provider, key_id))
+        if bucket is None:
+            rpm = self.provider_rpm.get(provider, 60) if key_id is None else self.key_rpm.get(provider, 60)
+            rate = rpm / 60.0
+            bucket = TokenBucket(rate, max(1.0, rate * self.burst_seconds))
+            self._buckets[(provider, key_id)] = bucket
+        return bucket
@@ -0,0 +1,181 @@
+# modules/response_cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+CACHE_DIR = DATA_DIR / "cache" / "responses"
+
+
+def normalize_question(question):
+    """Normalize a question so trivial variations share a cache entry"""
+    text = question.lower().strip()
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip("?!. ")
+
+
+class ResponseCache:
+    """Two-level answer cache: in-process LRU in front of an on-disk store"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_memory_entries=256,
+                 max_disk_entries=5000, ttl_seconds=7 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_entries = sum(1 for f in os.listdir(self.cache_dir) if f.endswith(".json"))
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(question, subject, provider):
+        """Build the cache key from normalized question, subject and provider"""
+        raw = json.dumps([normalize_question(question), (subject or "").lower(), provider])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question, subject, provider):
+        """Return a cached answer or None"""
+        return self.get_any(question, subject, [provider])
+
+    def get_any(self, question, subject, providers):
+        """Return the first cached answer from any of the providers, or None"""
+        for provider in providers:
+            answer = self._lookup(self.make_key(question, subject, provider))
+            if answer is not None:
+                return answer
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def _lookup(self, key):
+        """Check memory then disk for a live entry, counting hits"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry["created"] < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry["answer"]
+                del self._memory[key]
+
+        entry = self._read_disk(key)
+        if entry is None:
+            return None
+
+        with self._lock:
+            if now - entry["created"] >= self.ttl_seconds:
+                self._remove_disk(key)
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, entry)
+
+        # Touch the file so disk eviction approximates LRU
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return entry["answer"]
+
+    def set(self, question, subject, provider, answer):
+        """Store an answer in both cache levels"""
+        key = self.make_key(question, subject, provider)
+        entry = {
+            "question": question,
+            "subject": subject,
+            "provider": provider,
+            "answer": answer,
+            "created": time.time(),
+        }
+
+        with self._lock:
+            self._remember(key, entry)
+            is_new = not self._path(key).exists()
+            self._write_disk(key, entry)
+            self.stats["writes"] += 1
+            if is_new:
+                self._disk_entries += 1
+            if self._disk_entries > self.max_disk_entries:
+                self._evict_disk()
+
+    def clear(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._memory.clear()
+            for file in os.listdir(self.cache_dir):
+                if file.endswith(".json"):
+                    os.remove(self.cache_dir / file)
+            self._disk_entries = 0
+
+    def get_stats(self):
+        """Return hit/miss counters and current sizes"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._disk_entries
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, entry):
+        """Insert into the in-memory LRU (caller holds the lock)"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, entry):
+        tmp_path = self.cache_dir / f"{key}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(key))
+
+    def _remove_disk(self, key):
+        try:
+            os.remove(self._path(key))
+            self._disk_entries -= 1
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        """Remove the least recently used tenth of the disk store"""
+        files = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json")]
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        overflow = len(files) - self.max_disk_entries
+        batch = max(overflow, self.max_disk_entries // 10, 1)
+        for entry in files[:batch]:
+            try:
+                os.remove(entry.path)
+                self.stats["evictions"] += 1
+            except OSError:
+                pass
+        self._disk_entries = len(files) - batch
@@ -0,0 +1,192 @@
+# modules/review_history.py
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from modules.file_lock import exclusive_lock
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+USER_DATA_DIR = DATA_DIR / "user_data"
+
+
+class ReviewHistory:
+    """Every quiz answer appended to a JSONL event log, plus rollups kept up to date.
+
+    The rollups (per day, per topic, per difficulty, streaks) are updated as
+    each event is recorded and saved with the log offset they cover, so the
+    stats pages never rescan the history; on startup only events written
+    after the last save are replayed.
+    """
+
+    def __init__(self, directory=USER_DATA_DIR, save_every=20):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.events_path = self.directory / "review_events.jsonl"
+        self.rollups_path = self.directory / "review_rollups.json"
+        self.lock_path = self.directory / "review_events.lock"
+        self.save_every = save_every
+
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._rollups = self._empty_rollups()
+        with exclusive_lock(self.lock_path):
+            self._load()
+
+    def record(self, topic, difficulty, correct, deck=None, card_id=None, quality=None, ts=None):
+        """Append one answer and fold it into the rollups"""
+        event = {
+            "ts": round(time.time() if ts is None else ts, 3),
+            "deck": deck,
+            "card": card_id,
+            "topic": topic or "General",
+            "difficulty": difficulty or "unknown",
+            "correct": bool(correct),
+        }
+        if quality is not None:
+            event["q"] = quality
+        line = json.dumps(event, separators=(",", ":")) + "\n"
+
+        with self._lock, exclusive_lock(self.lock_path):
+            self._catch_up(repair=True)
+            with open(self.events_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._apply(event)
+            self._rollups["offset"] += len(line.encode("utf-8"))
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save()
+        return event
+
+    def get_stats(self, days=30, today=None):
+        """Precomputed totals, streaks, accuracy per topic/difficulty and reviews per day"""
+        today = today or date.today()
+        with self._lock:
+            self._catch_up()
+            rollups = self._rollups
+            streak = rollups["streak"]
+            last_day = streak["last_day"]
+            # A streak survives until a whole day passes without reviews
+            current = streak["current"] if last_day in (today.isoformat(), (today - timedelta(days=1)).isoformat()) else 0
+
+            recent = {}
+            for offset in range(days - 1, -1, -1):
+                day = (today - timedelta(days=offset)).isoformat()
+                recent[day] = rollups["days"].get(day, [0, 0])[0]
+
+            return {
+                "reviews": rollups["reviews"],
+                "correct": rollups["correct"],
+                "accuracy": rollups["correct"] / rollups["reviews"] if rollups["reviews"] else 0.0,
+                "current_streak": current,
+                "longest_streak": streak["longest"],
+                "study_days": len(rollups["days"]),
+                "topics": self._accuracy(rollups["topics"]),
+                "difficulties": self._accuracy(rollups["difficulties"]),
+                "reviews_per_day": recent,
+            }
+
+    def flush(self):
+        with self._lock, exclusive_lock(self.lock_path):
+            if self._unsaved:
+                self._save()
+
+    @staticmethod
+    def _accuracy(counts):
+        return {
+            name: {"reviews": reviews, "correct": correct, "accuracy": correct / reviews if reviews else 0.0}
+            for name, (reviews, correct) in sorted(counts.items(), key=lambda item: -item[1][0])
+        }
+
+    @staticmethod
+    def _empty_rollups():
+        return {
+            "version": 1,
+            "offset": 0,
+            "reviews": 0,
+            "correct": 0,
+            "days": {},
+            "topics": {},
+            "difficulties": {},
+            "streak": {"current": 0, "longest": 0, "last_day": None},
+        }
+
+    def _apply(self, event):
+        rollups = self._rollups
+        correct = int(event["correct"])
+        rollups["reviews"] += 1
+        rollups["correct"] += correct
+
+        day = datetime.fromtimestamp(event["ts"]).date()
+        for table, key in ((rollups["days"], day.isoformat()),
+                           (rollups["topics"], event["topic"]),
+                           (rollups["difficulties"], event["difficulty"])):
+            counts = table.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += correct
+
+        streak = rollups["streak"]
+        last_day = date.fromisoformat(streak["last_day"]) if streak["last_day"] else None
+        if last_day is None or day > last_day:
+            streak["current"] = streak["current"] + 1 if last_day == day - timedelta(days=1) else 1
+            streak["longest"] = max(streak["longest"], streak["current"])
+            streak["last_day"] = day.isoformat()
+
+    def _load(self):
+        """Read the saved rollups and fold in any events logged after them"""
+        if self.rollups_path.exists():
+            try:
+                with open(self.rollups_path, "r", encoding="utf-8") as f:
+                    self._rollups = json.load(f)
+            except (OSError, ValueError):
+                print("⚠️  Review rollups unreadable; rebuilding from the event log")
+                self._rollups = self._empty_rollups()
+
+        if not self.events_path.exists():
+            return
+        if self._rollups["offset"] > self.events_path.stat().st_size:
+            self._rollups = self._empty_rollups()  # Log was replaced; start over
+        if self._replay_tail():
+            self._save()
+
+    def _catch_up(self, repair=False):
+        """Fold in answers another process (CLI and web app) has logged since"""
+        if self.events_path.exists() and self.events_path.stat().st_size > self._rollups["offset"]:
+            self._replay_tail(repair)
+
+    def _replay_tail(self, repair=False):
+        """Fold in events after the rollups' offset; returns how many there were.
+
+        Replay stops at the last complete line. Only a caller holding the
+        log's lock passes repair=True: no write can be in progress then, so
+        an unterminated line is a crashed write and is cut off.
+        """
+        replayed = 0
+        with open(self.events_path, "r+b") as f:
+            f.seek(self._rollups["offset"])
+            for line in f:
+                if not line.endswith(b"\n"):
+                    if repair:
+                        # Torn last write: cut it off so the next event starts a clean line
+                        f.truncate(self._rollups["offset"])
+                    break
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    pass
+                self._rollups["offset"] += len(line)
+                replayed += 1
+        return replayed
+
+    def _save(self):
+        """Write the rollups (caller holds the log's lock, so saves never interleave)"""
+        self._catch_up(repair=True)
+        tmp_path = self.rollups_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._rollups, f)
+        os.replace(tmp_path, self.rollups_path)
+        self._unsaved = 0
@@ -0,0 +1,366 @@
+# modules/review_scheduler.py
+import hashlib
+import heapq
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+USER_DATA_DIR = DATA_DIR / "user_data"
+REVIEW_DB = USER_DATA_DIR / "reviews.db"
+
+DAY = 86400.0
+RECALLED = 3  # SM-2 quality at or above this counts as remembered
+GOOD = 4      # "I got it right"
+AGAIN = 1     # "I was wrong"
+
+# Review state of generated cards that were never saved, keyed by content
+UNSAVED_DECK = "(unsaved)"
+
+
+def sm2(easiness, interval, repetitions, quality):
+    """One SM-2 step. quality is 0-5, interval is in days; returns the new triple"""
+    if quality >= RECALLED:
+        if repetitions == 0:
+            interval = 1.0
+        elif repetitions == 1:
+            interval = 6.0
+        else:
+            interval = round(interval * easiness, 2)
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval = 1.0
+    easiness = max(1.3, easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return easiness, interval, repetitions
+
+
+def card_key(card, position, deck=None):
+    """(deck, card id) under which a card's review state is kept.
+
+    Cards of a saved set are keyed by the set's filename and their id in it;
+    freshly generated cards carry the set they were saved to ('saved_set'), so
+    they keep their state once that set is loaded. Cards never saved anywhere
+    fall back to a hash of their text.
+    """
+    deck = deck or card.get('saved_set')
+    if deck:
+        card_id = card.get('id')
+        return (deck, str(position + 1 if card_id is None else card_id))
+    text = f"{card.get('question')}\x00{card.get('answer')}"
+    return (UNSAVED_DECK, hashlib.sha1(text.encode("utf-8")).hexdigest()[:16])
+
+
+class DueQueue:
+    """Min-heap of items by due time with an index, so push/pop/update are O(log n).
+
+    Re-pushing or removing an item leaves its old heap entry behind; stale
+    entries are skipped when they reach the top.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._seq = 0
+
+    def push(self, item, due):
+        self._seq += 1
+        self._entries[item] = (due, self._seq)
+        heapq.heappush(self._heap, (due, self._seq, item))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._rebuild()
+
+    def remove(self, item):
+        self._entries.pop(item, None)
+
+    def peek(self):
+        """Return (item, due) of the earliest item, or None"""
+        self._drop_stale()
+        if not self._heap:
+            return None
+        due, _, item = self._heap[0]
+        return item, due
+
+    def pop_due(self, now=None):
+        """Remove and return the earliest item if it is due by now, else None"""
+        top = self.peek()
+        if top is None or top[1] > (time.time() if now is None else now):
+            return None
+        heapq.heappop(self._heap)
+        del self._entries[top[0]]
+        return top[0]
+
+    def count_due(self, now=None):
+        # Linear, but this queue only ever holds an in-memory session deck
+        now = time.time() if now is None else now
+        return sum(1 for due, _ in self._entries.values() if due <= now)
+
+    def next_due(self):
+        """When the earliest queued card is due, or None if the queue is empty"""
+        top = self.peek()
+        return top[1] if top else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item):
+        return item in self._entries
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and self._entries.get(heap[0][2]) != (heap[0][0], heap[0][1]):
+            heapq.heappop(heap)
+
+    def _rebuild(self):
+        self._heap = [(due, seq, item) for item, (due, seq) in self._entries.items()]
+        heapq.heapify(self._heap)
+
+
+class DeckReviewQueue:
+    """Review order for one saved set, read from the (deck, due) index as it goes.
+
+    Never-reviewed cards come first, in deck order, found by scanning forward
+    from a per-deck cursor; then reviewed cards by due time, fetched a page at
+    a time with keyset pagination. Nothing is materialised per card, so
+    starting a quiz on a large lazy deck costs a few indexed queries.
+    """
+
+    PAGE_SIZE = 64
+
+    def __init__(self, scheduler, cards, deck):
+        self.scheduler = scheduler
+        self.cards = cards
+        self.deck = deck
+        self._new_position = scheduler._new_cursor(deck)
+        if self._new_position > len(cards):
+            self._new_position = 0  # The set was replaced by a shorter one
+        self._new = []
+        self._due = []
+        self._after = (-1.0, "")  # (due, card_id) of the last reviewed card handed out
+        self._positions = None
+
+    def pop_due(self, now=None):
+        """Position of the next card to review, or None when nothing is due"""
+        now = time.time() if now is None else now
+        if not self._new:
+            self._scan_new()
+        if self._new:
+            return self._new.pop(0)
+
+        while True:
+            if not self._due:
+                self._due = self.scheduler._due_page(self.deck, now, self._after, self.PAGE_SIZE)
+                if not self._due:
+                    return None
+            card_id, position, due = self._due.pop(0)
+            self._after = (due, card_id)
+            position = self._locate(card_id, position)
+            if position is not None:
+                return position
+
+    def count_due(self, now=None):
+        now = time.time() if now is None else now
+        reviewed, due = self.scheduler._deck_counts(self.deck, now)
+        return due + max(0, len(self.cards) - reviewed)
+
+    def next_due(self):
+        return self.scheduler._next_due(self.deck)
+
+    def _scan_new(self):
+        """Find the next never-reviewed positions, a page of cards at a time"""
+        start = self._new_position
+        while not self._new and self._new_position < len(self.cards):
+            first = self._new_position
+            positions = range(first, min(first + self.PAGE_SIZE, len(self.cards)))
+            keys = {position: card_key(self.cards[position], position, self.deck)[1] for position in positions}
+            reviewed = self.scheduler._reviewed_ids(self.deck, list(keys.values()))
+            self._new = [position for position, card_id in keys.items() if card_id not in reviewed]
+            self._new_position = positions.stop
+            if not self._new and first == start:
+                start = positions.stop
+        if start > self.scheduler._new_cursor(self.deck):
+            # Everything before start has been reviewed; later quizzes skip it
+            self.scheduler._set_new_cursor(self.deck, start)
+
+    def _locate(self, card_id, position):
+        """Position of a reviewed card, checking the stored one still holds it"""
+        if position is not None and position < len(self.cards):
+            if card_key(self.cards[position], position, self.deck)[1] == card_id:
+                return position
+        if self._positions is None:
+            # Only for state recorded before the card's position was known
+            self._positions = {card_key(card, i, self.deck)[1]: i for i, card in enumerate(self.cards)}
+        return self._positions.get(card_id)
+
+
+class ReviewScheduler:
+    """SM-2 spaced repetition: per-card review state kept in SQLite across restarts"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS review_state (
+            deck TEXT NOT NULL,
+            card_id TEXT NOT NULL,
+            easiness REAL NOT NULL,
+            interval REAL NOT NULL,
+            repetitions INTEGER NOT NULL,
+            due REAL NOT NULL,
+            last_review REAL,
+            reviews INTEGER NOT NULL,
+            lapses INTEGER NOT NULL,
+            position INTEGER,
+            PRIMARY KEY (deck, card_id)
+        ) WITHOUT ROWID;
+        DROP INDEX IF EXISTS idx_review_due;
+        CREATE INDEX IF NOT EXISTS idx_review_deck_due ON review_state(deck, due);
+        CREATE TABLE IF NOT EXISTS new_card_cursor (
+            deck TEXT PRIMARY KEY,
+            position INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, db_path=REVIEW_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(review_state)")}
+        if columns and "position" not in columns:
+            self._conn.execute("ALTER TABLE review_state ADD COLUMN position INTEGER")
+        self._conn.executescript(self.SCHEMA)
+
+    def due_queue(self, cards, deck=None):
+        """Review order for cards: never-reviewed ones first, in deck order, then by due time.
+
+        A saved set (deck given) is read from the due index as the quiz goes;
+        an in-memory session deck (deck=None) is small and queued up front.
+        """
+        if deck:
+            return DeckReviewQueue(self, cards, deck)
+
+        keys = [card_key(card, position) for position, card in enumerate(cards)]
+        due_by_key = {}
+        with self._lock:
+            for name in {key[0] for key in keys}:
+                ids = [key[1] for key in keys if key[0] == name]
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    rows = self._conn.execute(
+                        f"SELECT card_id, due FROM review_state WHERE deck = ? "
+                        f"AND card_id IN ({','.join('?' * len(chunk))})", (name, *chunk)
+                    )
+                    for row in rows:
+                        due_by_key[(name, row['card_id'])] = row['due']
+
+        queue = DueQueue()
+        for position, key in enumerate(keys):
+            queue.push(position, due_by_key.get(key, 0.0))
+        return queue
+
+    def review(self, card, position, quality, deck=None, now=None):
+        """Record one answer (quality 0-5) and return the card's new state"""
+        now = time.time() if now is None else now
+        name, card_id = card_key(card, position, deck)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT easiness, interval, repetitions, reviews, lapses FROM review_state "
+                "WHERE deck = ? AND card_id = ?", (name, card_id)
+            ).fetchone()
+            easiness, interval, repetitions, reviews, lapses = tuple(row) if row else (2.5, 0.0, 0, 0, 0)
+
+            easiness, interval, repetitions = sm2(easiness, interval, repetitions, quality)
+            state = {
+                "deck": name,
+                "card_id": card_id,
+                "easiness": easiness,
+                "interval": interval,
+                "repetitions": repetitions,
+                "due": now + interval * DAY,
+                "last_review": now,
+                "reviews": reviews + 1,
+                "lapses": lapses + (quality < RECALLED),
+                # Only meaningful within the saved set itself
+                "position": position if deck else None,
+            }
+            self._conn.execute(
+                "INSERT INTO review_state "
+                "(deck, card_id, easiness, interval, repetitions, due, last_review, reviews, lapses, position) "
+                "VALUES (:deck, :card_id, :easiness, :interval, :repetitions, :due, :last_review, :reviews, :lapses, :position) "
+                "ON CONFLICT (deck, card_id) DO UPDATE SET easiness = excluded.easiness, "
+                "interval = excluded.interval, repetitions = excluded.repetitions, due = excluded.due, "
+                "last_review = excluded.last_review, reviews = excluded.reviews, lapses = excluded.lapses, "
+                "position = COALESCE(excluded.position, review_state.position)",
+                state
+            )
+        return state
+
+    def get_state(self, card, position, deck=None):
+        name, card_id = card_key(card, position, deck)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM review_state WHERE deck = ? AND card_id = ?", (name, card_id)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_stats(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS cards, COALESCE(SUM(due <= ?), 0) AS due FROM review_state", (now,)
+            ).fetchone()
+        return {"cards": row['cards'], "due": row['due']}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Indexed queries behind DeckReviewQueue
+    def _due_page(self, deck, now, after, limit):
+        """Reviewed cards due by now, in (due, card_id) order after the given pair"""
+        due, card_id = after
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT card_id, position, due FROM review_state "
+                "WHERE deck = ? AND due <= ? AND (due > ? OR (due = ? AND card_id > ?)) "
+                "ORDER BY due, card_id LIMIT ?",
+                (deck, now, due, due, card_id, limit)
+            ).fetchall()
+        return [(row['card_id'], row['position'], row['due']) for row in rows]
+
+    def _deck_counts(self, deck, now):
+        """(cards with review state, of which due by now)"""
+        with self._lock:
+            reviewed = self._conn.execute("SELECT COUNT(*) FROM review_state WHERE deck = ?", (deck,)).fetchone()[0]
+            due = self._conn.execute(
+                "SELECT COUNT(*) FROM review_state WHERE deck = ? AND due <= ?", (deck, now)
+            ).fetchone()[0]
+        return reviewed, due
+
+    def _next_due(self, deck):
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(due) AS due FROM review_state WHERE deck = ?", (deck,)).fetchone()
+        return row['due']
+
+    def _reviewed_ids(self, deck, card_ids):
+        if not card_ids:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT card_id FROM review_state WHERE deck = ? AND card_id IN ({','.join('?' * len(card_ids))})",
+                (deck, *card_ids)
+            )
+            return {row['card_id'] for row in rows}
+
+    def _new_cursor(self, deck):
+        with self._lock:
+            row = self._conn.execute("SELECT position FROM new_card_cursor WHERE deck = ?", (deck,)).fetchone()
+        return row['position'] if row else 0
+
+    def _set_new_cursor(self, deck, position):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO new_card_cursor VALUES (?, ?)", (deck, position))
@@ -0,0 +1,402 @@
+# modules/semantic_cache.py
+import json
+import os
+import re
+import threading
+import zlib
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+from modules.file_lock import exclusive_lock
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+SEMANTIC_DIR = DATA_DIR / "cache" / "semantic"
+
+# Bumped whenever analyze() changes, so vectors saved by an older version are recomputed
+VECTORS_VERSION = 3
+
+# Question filler words that do not change what is being asked
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "in", "on", "to",
+    "for", "and", "or", "it", "its", "this", "that", "does", "do", "did", "can",
+    "could", "you", "me", "i", "my", "please", "tell", "about", "show", "give",
+    "help", "understand",
+}
+
+# Question words and the kind of answer they ask for. "What is X", "explain
+# X", "how does X work" and a bare "X" all want an explanation; "why does X
+# work" wants a different answer.
+QUESTION_WORDS = {
+    "what": "explain", "whats": "explain", "explain": "explain", "describe": "explain",
+    "define": "explain", "mean": "explain", "means": "explain", "meaning": "explain",
+    "how": "how", "why": "why", "when": "when", "where": "where", "who": "who", "which": "which",
+}
+
+# A token in fewer than this share of cached questions (or fewer than
+# RARE_MIN_COUNT of them) is specific to its question, so it must match exactly
+RARE_FRACTION = 0.01
+RARE_MIN_COUNT = 10
+
+# Candidates above the threshold checked for exact token agreement, best first
+VERIFY_CANDIDATES = 5
+
+
+def analyze(text):
+    """Return (intent, tokens): what kind of answer is asked for, and the content words.
+
+    Tokens are lowercased, without apostrophes or filler words, with plurals crudely stemmed.
+    """
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("'", "").replace("’", ""))
+    intent = None
+    tokens = []
+    for word in words:
+        if word in STOP_WORDS:
+            continue
+        if word in QUESTION_WORDS:
+            # "Explain why X" asks why: a specific question word wins
+            if intent in (None, "explain"):
+                intent = QUESTION_WORDS[word]
+            continue
+        if len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        tokens.append(word)
+
+    if intent == "how" and tokens and tokens[-1] == "work":
+        # "How does X work" asks for an explanation of X
+        tokens.pop()
+        intent = "explain"
+    return intent or "explain", tokens
+
+
+def tokenize(text):
+    """Content words of a question (see analyze)"""
+    return analyze(text)[1]
+
+
+def _hash(gram):
+    return zlib.crc32(gram.encode("utf-8"))
+
+
+# The intent features are in most vectors; candidates are found by content words only
+INTENT_FEATURES = {_hash(f"?{intent}") for intent in set(QUESTION_WORDS.values())}
+
+
+class HashingVectorizer:
+    """Offline feature-hashing vectorizer over unigrams, bigrams and the question's intent"""
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def features(self, text):
+        """Return the 32-bit feature hashes for a text"""
+        intent, tokens = analyze(text)
+        if not tokens:
+            return []
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])] + [f"?{intent}"]
+        return [_hash(gram) for gram in grams]
+
+    def transform(self, features):
+        """Project feature hashes into a unit-length dense vector"""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in features:
+            sign = 1.0 if (feature >> 31) & 1 else -1.0
+            vector[feature % self.dimensions] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+
+class SemanticCache:
+    """Serve answers for questions that are worded differently but ask the same thing.
+
+    A hit needs a cosine similarity above the threshold and the same intent,
+    the same numbers and the same rare words as the stored question, so "x
+    equals 2" never answers "x equals 3".
+
+    On disk each line of entries.jsonl names its row in the vectors file and
+    carries a checksum of that vector. Both files are written under a
+    cross-process lock; a vector that is missing or does not match its
+    checksum is recomputed on load.
+    """
+
+    def __init__(self, cache_dir=SEMANTIC_DIR, threshold=0.85, max_entries=100000,
+                 dimensions=256, max_candidates=256):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.entries_path = self.cache_dir / "entries.jsonl"
+        self.vectors_path = self.cache_dir / f"vectors-v{VECTORS_VERSION}.f32"
+        self.lock_path = self.cache_dir / "cache.lock"
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_candidates = max_candidates
+        self.vectorizer = HashingVectorizer(dimensions)
+
+        self._lock = threading.Lock()
+        self._reset()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+
+        with self._lock, exclusive_lock(self.lock_path):
+            self._load()
+
+    def lookup(self, question, subject=None):
+        """Return (entry, score) for the closest stored question above threshold"""
+        features = self.vectorizer.features(question)
+        if not features:
+            return None
+        vector = self.vectorizer.transform(features)
+        intent, tokens = analyze(question)
+
+        with self._lock:
+            rows = [np.frombuffer(self._postings[f], dtype=np.int32)
+                    for f in set(features) - INTENT_FEATURES if f in self._postings]
+            if not rows:
+                self.stats["misses"] += 1
+                return None
+
+            # Only rows sharing a feature can clear the threshold; score the
+            # ones with the most shared features densely
+            overlap = np.bincount(np.concatenate(rows), minlength=len(self._entries))
+            codes = np.frombuffer(self._subject_codes, dtype=np.int32)
+            overlap[codes != self._subjects.get((subject or "").lower(), -1)] = 0
+            candidates = np.flatnonzero(overlap)
+            if len(candidates) > self.max_candidates:
+                top = np.argpartition(overlap[candidates], -self.max_candidates)[-self.max_candidates:]
+                candidates = candidates[top]
+            if not len(candidates):
+                self.stats["misses"] += 1
+                return None
+
+            scores = self._matrix[candidates] @ vector
+            for best in np.argsort(-scores)[:VERIFY_CANDIDATES]:
+                score = float(scores[best])
+                if score < self.threshold:
+                    break
+                entry = self._entries[candidates[best]]
+                if self._same_question(intent, tokens, entry["question"]):
+                    self.stats["hits"] += 1
+                    return entry, score
+
+            self.stats["misses"] += 1
+            return None
+
+    def add(self, question, subject, provider, answer):
+        """Remember an answer for future similar questions"""
+        features = self.vectorizer.features(question)
+        if not features:
+            return
+        entry = {"question": question, "subject": subject, "provider": provider, "answer": answer}
+
+        with self._lock, exclusive_lock(self.lock_path):
+            if len(self._entries) >= self.max_entries:
+                self._compact()
+            row = self._append(entry, features)
+            self._write_entry(entry, self._matrix[row])
+            self.stats["writes"] += 1
+
+    def get_stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _same_question(self, intent, tokens, stored_question):
+        """Whether a similar stored question asks exactly the same thing (caller holds the lock)"""
+        stored_intent, stored_tokens = analyze(stored_question)
+        if stored_intent != intent:
+            return False
+        differing = set(tokens) ^ set(stored_tokens)
+        if any(any(c.isdigit() for c in token) for token in differing):
+            return False  # Numbers must match exactly
+        common = max(RARE_MIN_COUNT, RARE_FRACTION * len(self._entries))
+        return all(len(self._postings.get(_hash(token), ())) >= common for token in differing)
+
+    def _reset(self):
+        self._entries = []
+        self._matrix = np.zeros((1024, self.vectorizer.dimensions), dtype=np.float32)
+        self._postings = {}
+        self._subjects = {}
+        self._subject_codes = array("i")
+
+    def _append(self, entry, features, vector=None):
+        """Add an entry to the in-memory index (caller holds the lock)"""
+        row = len(self._entries)
+        if row >= len(self._matrix):
+            grown = np.zeros((len(self._matrix) * 2, self.vectorizer.dimensions), dtype=np.float32)
+            grown[:row] = self._matrix[:row]
+            self._matrix = grown
+
+        self._matrix[row] = vector if vector is not None else self.vectorizer.transform(features)
+        self._entries.append(entry)
+
+        subject = (entry.get("subject") or "").lower()
+        self._subject_codes.append(self._subjects.setdefault(subject, len(self._subjects)))
+        for feature in set(features) - INTENT_FEATURES:
+            self._postings.setdefault(feature, array("i")).append(row)
+        return row
+
+    def _write_entry(self, entry, vector):
+        """Append one entry and its vector to disk (caller holds both locks)"""
+        row_bytes = self.vectorizer.dimensions * 4
+        with open(self.vectors_path, "ab") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size % row_bytes:
+                f.truncate(size - size % row_bytes)  # Torn vector from a crash
+            disk_row = size // row_bytes
+            f.write(vector.tobytes())
+
+        record = dict(entry, row=disk_row, crc=zlib.crc32(vector.tobytes()))
+        line = json.dumps(record).encode("utf-8") + b"\n"
+        with open(self.entries_path, "a+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line  # End a torn last line so this record starts its own
+            f.write(line)
+
+    def _load(self):
+        """Rebuild the index from disk, reusing saved vectors that match their checksum"""
+        if not self.entries_path.exists():
+            return
+
+        entries = []
+        torn = 0
+        with open(self.entries_path, "r") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    torn += 1
+
+        saved = np.zeros((0, self.vectorizer.dimensions), dtype=np.float32)
+        if self.vectors_path.exists():
+            saved = np.fromfile(self.vectors_path, dtype=np.float32)
+            saved = saved[:len(saved) - len(saved) % self.vectorizer.dimensions]
+            saved = saved.reshape(-1, self.vectorizer.dimensions)
+
+        recomputed = 0
+        for i, entry in enumerate(entries):
+            row = entry.pop("row", None)
+            crc = entry.pop("crc", None)
+            vector = None
+            if isinstance(row, int) and 0 <= row < len(saved) and zlib.crc32(saved[row].tobytes()) == crc:
+                vector = saved[row]
+            else:
+                recomputed += 1
+            self._append(entry, self.vectorizer.features(entry["question"]), vector)
+
+        if torn or recomputed or len(saved) != len(entries):
+            self._rewrite()
+
+        for stale in self.cache_dir.glob("vectors*.f32"):
+            if stale != self.vectors_path and not stale.name.endswith(".tmp.f32"):
+                stale.unlink()
+
+    def _rewrite(self):
+        """Write both files from memory, one row per entry (caller holds both locks)"""
+        vectors_tmp = self.cache_dir / f"vectors.{os.getpid()}.tmp.f32"
+        self._matrix[:len(self._entries)].tofile(vectors_tmp)
+        entries_tmp = self.cache_dir / f"entries.{os.getpid()}.tmp.jsonl"
+        with open(entries_tmp, "w") as f:
+            for row, entry in enumerate(self._entries):
+                crc = zlib.crc32(self._matrix[row].tobytes())
+                f.write(json.dumps(dict(entry, row=row, crc=crc)) + "\n")
+        # Either order is safe: checksums catch entries paired with the other file's old rows
+        os.replace(vectors_tmp, self.vectors_path)
+        os.replace(entries_tmp, self.entries_path)
+
+    def _compact(self):
+        """Drop the oldest tenth of entries and rewrite the store (caller holds both locks)"""
+        # Reload first so entries another process added are kept
+        self._reset()
+        self._load()
+        keep_from = max(len(self._entries) // 10, 1)
+        entries = self._entries[keep_from:]
+        vectors = self._matrix[keep_from:len(self._entries)].copy()
+
+        self._reset()
+        for entry, vector in zip(entries, vectors):
+            self._append(entry, self.vectorizer.features(entry["question"]), vector)
+        self._rewrite()
+
+
+# Tests
+def test_question_words_keep_questions_apart():
+    """Same topic, different question word: not a cache hit; a rewording still is"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SemanticCache(directory)
+        cache.add("how does photosynthesis work", None, "test", "Light is turned into sugar...")
+        assert cache.lookup("why does photosynthesis work", None) is None
+        hit = cache.lookup("How does photosynthesis work?", None)
+        assert hit is not None and hit[0]["provider"] == "test"
+        print(f"✅ why/how questions kept apart; rewording matched at {hit[1]:.2f}")
+
+
+def test_paraphrases_hit():
+    """The rewordings the cache exists for are served from "what is photosynthesis\""""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SemanticCache(directory)
+        cache.add("what is photosynthesis", None, "test", "Plants turn light into sugar.")
+        for question in ("explain photosynthesis", "what's photosynthesis?",
+                         "how does photosynthesis work", "photosynthesis", "Define photosynthesis."):
+            hit = cache.lookup(question, None)
+            assert hit is not None, f"{question!r} missed"
+        print("✅ Paraphrases of a cached question are hits")
+
+
+def test_numbers_and_rare_words_must_match():
+    """A question that differs only by a number or a specific term is not the same question"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SemanticCache(directory)
+        cache.add("find the derivative of x squared plus 5x with respect to x when x equals 2",
+                  None, "test", "At x = 2 the derivative is 9.")
+        cache.add("what is the role of mitochondria in animal cells", None, "test", "Energy.")
+        assert cache.lookup("find the derivative of x squared plus 5x with respect to x when x equals 3", None) is None
+        assert cache.lookup("what is the role of chloroplasts in animal cells", None) is None
+        assert cache.lookup("Find the derivative of x squared plus 5x with respect to x when x equals 2?", None)
+        print("✅ Questions differing by a number or a rare word are misses")
+
+
+def test_torn_entry_keeps_vectors_paired():
+    """A torn line or a lost vector never pairs a stored answer with another question's vector"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SemanticCache(directory)
+        cache.add("what is osmosis", None, "test", "Osmosis answer")
+        with open(cache.entries_path, "a") as f:
+            f.write('{"question": "what is a torn li')  # Crash mid-write
+        cache = SemanticCache(directory)
+        cache.add("what is diffusion", None, "test", "Diffusion answer")
+        cache.add("what is evaporation", None, "test", "Evaporation answer")
+
+        # Drop the vectors file: every vector is recomputed, none shifted
+        cache.vectors_path.unlink()
+        cache = SemanticCache(directory)
+        for topic in ("osmosis", "diffusion", "evaporation"):
+            entry, _ = cache.lookup(f"explain {topic}", None)
+            assert entry["answer"] == f"{topic.capitalize()} answer", entry
+        assert cache.get_stats()["entries"] == 3
+        print("✅ Stored answers stay paired with their own questions after a torn write")
+
+
+if __name__ == "__main__":
+    test_question_words_keep_questions_apart()
+    test_paraphrases_hit()
+    test_numbers_and_rare_words_must_match()
+    test_torn_entry_keeps_vectors_paired()
@@ -0,0 +1,137 @@
+# modules/session_decks.py
+import sys
+import threading
+from collections import OrderedDict
+
+
+def deck_size(cards):
+    """Rough in-memory size of a deck in bytes"""
+    if not isinstance(cards, (list, tuple)):
+        return sys.getsizeof(cards)  # Lazy deck: cards stay on disk
+    size = sys.getsizeof(cards)
+    for card in cards:
+        size += sys.getsizeof(card)
+        size += sum(sys.getsizeof(card.get(field)) for field in ("question", "answer"))
+    return size
+
+
+class SharedDeckCache:
+    """Saved sets loaded once and shared read-only by every session.
+
+    Least recently used sets are evicted when there are more than max_decks
+    of them or together they take more than max_bytes.
+    """
+
+    def __init__(self, loader, max_decks=32, max_bytes=64 * 1024 * 1024):
+        self.loader = loader
+        self.max_decks = max_decks
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._decks = OrderedDict()
+        self._bytes = 0
+        # Bumped by invalidate() so a set loaded across an invalidation is not kept
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, filename):
+        """Return the cards of a saved set (a tuple, or a lazy deck), or None"""
+        with self._lock:
+            entry = self._decks.get(filename)
+            if entry is not None:
+                self._decks.move_to_end(filename)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            version = self._version
+
+        # Load outside the lock so one slow set does not block other sessions
+        cards = self.loader(filename)
+        if cards is None:
+            return None
+        if isinstance(cards, list):
+            cards = tuple(cards)
+        size = deck_size(cards)
+        if size > self.max_bytes:
+            return cards  # Too big to keep; the caller still gets it
+
+        with self._lock:
+            if version != self._version:
+                return cards  # Possibly stale; the next get() loads it again
+            old = self._decks.pop(filename, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._decks[filename] = (cards, size)
+            self._bytes += size
+            while len(self._decks) > self.max_decks or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._decks.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return cards
+
+    def invalidate(self, filename=None):
+        """Drop one set (or every set) so the next get() reloads it"""
+        with self._lock:
+            self._version += 1
+            if filename is None:
+                self._decks.clear()
+                self._bytes = 0
+                return
+            entry = self._decks.pop(filename, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "decks": len(self._decks),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SessionDeck:
+    """The working deck of one browser session.
+
+    It either points at a shared read-only set or holds the session's own
+    generated cards, capped at max_cards (oldest cards are dropped first).
+    """
+
+    def __init__(self, max_cards=500):
+        self.max_cards = max_cards
+        self.source = None
+        self._cards = ()
+        self._lock = threading.Lock()
+
+    def use_set(self, filename, cards):
+        with self._lock:
+            self._cards = cards
+            self.source = filename
+
+    def add(self, cards):
+        """Add generated cards; a loaded set is replaced, not copied"""
+        with self._lock:
+            current = list(self._cards) if self.source is None else []
+            self._cards = tuple((current + list(cards))[-self.max_cards:])
+            self.source = None
+
+    def clear(self):
+        with self._lock:
+            self._cards = ()
+            self.source = None
+
+    @property
+    def cards(self):
+        return self._cards
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __getitem__(self, index):
+        return self._cards[index]
@@ -0,0 +1,194 @@
+# modules/study_retriever.py
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+STUDY_CORPUS_DIR = DATA_DIR / "study_corpus"
+STUDY_INDEX_PATH = DATA_DIR / "cache" / "study_index.json"
+
+CORPUS_EXTENSIONS = {".md", ".txt"}
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "in", "on", "to",
+    "for", "and", "or", "it", "this", "that", "what", "how", "why", "does", "do",
+    "can", "with", "as", "by", "at", "from", "explain", "describe", "tell", "me",
+}
+
+
+def tokenize(text):
+    return [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOP_WORDS]
+
+
+def split_passages(text, target_words=120):
+    """Split a document on blank lines, merging short paragraphs"""
+    passages, current, words = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        current.append(paragraph)
+        words += len(paragraph.split())
+        if words >= target_words:
+            passages.append("\n\n".join(current))
+            current, words = [], 0
+    if current:
+        passages.append("\n\n".join(current))
+    return passages
+
+
+class StudyRetriever:
+    """BM25 search over local notes, kept in an incrementally updated on-disk index"""
+
+    def __init__(self, corpus_dir=STUDY_CORPUS_DIR, index_path=STUDY_INDEX_PATH,
+                 k1=1.5, b=0.75, refresh_interval=60.0):
+        self.corpus_dir = Path(corpus_dir)
+        self.index_path = Path(index_path)
+        self.k1 = k1
+        self.b = b
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._passages = {}
+        self._postings = {}
+        self._total_length = 0
+        self._next_id = 0
+        self._last_refresh = 0.0
+
+        self._load()
+        self.refresh()
+
+    def refresh(self):
+        """Index new or changed documents and drop deleted ones"""
+        with self._lock:
+            self._last_refresh = time.monotonic()
+            if not self.corpus_dir.exists():
+                return 0
+
+            seen = {}
+            for path in self.corpus_dir.rglob("*"):
+                if path.suffix.lower() in CORPUS_EXTENSIONS and path.is_file():
+                    stat = path.stat()
+                    seen[path.relative_to(self.corpus_dir).as_posix()] = (stat.st_mtime, stat.st_size)
+
+            changed = 0
+            for name in list(self._documents):
+                doc = self._documents[name]
+                if seen.get(name) != (doc["mtime"], doc["size"]):
+                    self._remove_document(name)
+                    changed += 1
+
+            for name, (mtime, size) in seen.items():
+                if name not in self._documents:
+                    self._add_document(name, mtime, size)
+                    changed += 1
+
+            if changed:
+                self._save()
+            return changed
+
+    def search(self, query, k=3):
+        """Return the k best (score, passage) pairs for a query"""
+        if time.monotonic() - self._last_refresh > self.refresh_interval:
+            self.refresh()
+
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._passages)
+            if not count or not terms:
+                return []
+            avg_length = self._total_length / count
+
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id, tf in postings.items():
+                    length = self._passages[passage_id]["length"]
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[passage_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            return [(score, self._passages[pid]) for pid, score in scores.most_common(k)]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "passages": len(self._passages),
+                "terms": len(self._postings),
+            }
+
+    def _add_document(self, name, mtime, size):
+        try:
+            text = (self.corpus_dir / name).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return
+
+        passage_ids = []
+        for passage in split_passages(text):
+            tf = Counter(tokenize(passage))
+            if not tf:
+                continue
+            passage_id = str(self._next_id)
+            self._next_id += 1
+            self._index_passage(passage_id, {
+                "doc": name,
+                "text": passage,
+                "length": sum(tf.values()),
+                "tf": dict(tf),
+            })
+            passage_ids.append(passage_id)
+
+        self._documents[name] = {"mtime": mtime, "size": size, "passages": passage_ids}
+
+    def _remove_document(self, name):
+        for passage_id in self._documents.pop(name)["passages"]:
+            passage = self._passages.pop(passage_id)
+            self._total_length -= passage["length"]
+            for term in passage["tf"]:
+                postings = self._postings[term]
+                del postings[passage_id]
+                if not postings:
+                    del self._postings[term]
+
+    def _index_passage(self, passage_id, passage):
+        self._passages[passage_id] = passage
+        self._total_length += passage["length"]
+        for term, tf in passage["tf"].items():
+            self._postings.setdefault(term, {})[passage_id] = tf
+
+    def _load(self):
+        """Read the saved index; postings are rebuilt from per-passage term counts"""
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Study index unreadable; rebuilding")
+            return
+
+        self._documents = data["documents"]
+        self._next_id = data["next_id"]
+        for passage_id, passage in data["passages"].items():
+            self._index_passage(passage_id, passage)
+
+    def _save(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "documents": self._documents,
+                "passages": self._passages,
+                "next_id": self._next_id,
+            }, f)
+        os.replace(tmp_path, self.index_path)
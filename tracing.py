@@ -0,0 +1,391 @@
+# modules/tracing.py
+import argparse
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Define paths directly here - NO config import
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+TRACES_DIR = DATA_DIR / "traces"
+
+SERVICE_NAME = "student-ai"
+
+# OTLP span status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed step of a request; ids and timestamps follow OpenTelemetry"""
+
+    recording = True
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    @property
+    def trace_id(self):
+        return self.trace.trace_id
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message):
+        self.status = STATUS_ERROR
+        self.status_message = str(message)[:500]
+
+    def record_exception(self, error):
+        self.set_error(f"{type(error).__name__}: {error}")
+        self.events.append({
+            "name": "exception",
+            "time_ns": time.time_ns(),
+            "attributes": {"exception.type": type(error).__name__, "exception.message": str(error)[:500]},
+        })
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace.finish(self)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        if self.events:
+            span["events"] = [
+                {"name": e["name"], "timeUnixNano": str(e["time_ns"]), "attributes": _otlp_attributes(e["attributes"])}
+                for e in self.events
+            ]
+        return span
+
+
+class _NonRecordingSpan:
+    """Stands in for spans of unsampled requests so their children are skipped too"""
+
+    recording = False
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+NON_RECORDING = _NonRecordingSpan()
+
+
+class _Trace:
+    """Spans of one request, exported together when the root span ends"""
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.root = None
+        self._lock = threading.Lock()
+        self._finished = []
+        self._exported = False
+
+    def finish(self, span):
+        with self._lock:
+            if self._exported:
+                # A hedged provider call that outlived its request; export it on its own line
+                batch = [span]
+            else:
+                self._finished.append(span)
+                if span is not self.root:
+                    return
+                batch, self._finished, self._exported = self._finished, [], True
+        self.tracer.export(batch)
+
+
+class Tracer:
+    """Writes sampled request traces to daily OTLP JSON files in data/traces.
+
+    Each line is one ExportTraceServiceRequest, the format of the
+    OpenTelemetry collector's file exporter. The sampling decision is taken
+    once per request (head sampling), so a trace is always complete.
+    """
+
+    def __init__(self, directory=TRACES_DIR, sample_rate=None, retention_days=None):
+        self.directory = Path(directory)
+        self.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0") if sample_rate is None else sample_rate)
+        self.retention_days = int(os.getenv("TRACE_RETENTION_DAYS", "7") if retention_days is None else retention_days)
+        self._lock = threading.Lock()
+        self._pruned_on = None
+        self.exported = 0
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Start a span as a child of the current one, or a new trace if there is none"""
+        span = self.start_span(name, **attributes)
+        try:
+            with use_span(span):
+                yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end()
+
+    def start_span(self, name, **attributes):
+        """Create a span under the current one without making it current; the caller ends it.
+
+        Generators use this instead of span(): a context variable set across a
+        yield leaks into whatever the consumer runs between items, so they make
+        the span current only around each step (see iterate_in).
+        """
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_rate > 0 and random.random() < self.sample_rate:
+                trace = _Trace(self)
+                trace.root = Span(trace, name, attributes=attributes)
+                return trace.root
+            return NON_RECORDING
+        if parent.recording:
+            return Span(parent.trace, name, parent.span_id, attributes)
+        return NON_RECORDING
+
+    def export(self, spans):
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{
+                    "scope": {"name": "modules.tracing"},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }, separators=(",", ":")) + "\n"
+
+        today = date.today()
+        with self._lock:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                if self._pruned_on != today:
+                    self._prune(today)
+                with open(self.directory / f"traces-{today.isoformat()}.jsonl", "a", encoding="utf-8") as f:
+                    f.write(line)
+                self.exported += 1
+            except OSError as e:
+                # Tracing must never fail the request it describes
+                print(f"⚠️  Could not write trace: {e}")
+
+    def _prune(self, today):
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        for path in self.directory.glob("traces-*.jsonl"):
+            if path.stem[len("traces-"):] < cutoff:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        self._pruned_on = today
+
+
+def current_span():
+    return _current_span.get() or NON_RECORDING
+
+
+@contextmanager
+def use_span(span):
+    """Make an already started span current for a block, without ending it"""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+def iterate_in(span, iterator, context=None):
+    """Yield from iterator with span current only while each item is produced.
+
+    context, if given, is a callable returning a context manager entered
+    around each step as well (e.g. to set more per-request state).
+    """
+    iterator = iter(iterator)
+    try:
+        while True:
+            with use_span(span), (context() if context else nullcontext()):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            # Cleanup (finally blocks of a generator) runs in the span too
+            with use_span(span), (context() if context else nullcontext()):
+                close()
+
+
+def _otlp_attributes(attributes):
+    result = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}  # OTLP JSON encodes int64 as a string
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        result.append({"key": key, "value": encoded})
+    return result
+
+
+def _attribute_values(attributes):
+    values = {}
+    for item in attributes or []:
+        value = item.get("value", {})
+        if "intValue" in value:
+            values[item["key"]] = int(value["intValue"])
+        else:
+            values[item["key"]] = next(iter(value.values()), None)
+    return values
+
+
+tracer = Tracer()
+span = tracer.span
+
+
+# Reading traces back
+def load_traces(directory=TRACES_DIR, days=None):
+    """{trace_id: [span dicts]} from the trace files, optionally only the last `days`"""
+    directory = Path(directory)
+    cutoff = (date.today() - timedelta(days=days - 1)).isoformat() if days else ""
+    traces = {}
+    for path in sorted(directory.glob("traces-*.jsonl")):
+        if path.stem[len("traces-"):] < cutoff:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line from a crash
+                for resource in request.get("resourceSpans", []):
+                    for scope in resource.get("scopeSpans", []):
+                        for s in scope.get("spans", []):
+                            traces.setdefault(s["traceId"], []).append({
+                                "span_id": s["spanId"],
+                                "parent_id": s.get("parentSpanId"),
+                                "name": s["name"],
+                                "start_ns": int(s["startTimeUnixNano"]),
+                                "end_ns": int(s["endTimeUnixNano"]),
+                                "attributes": _attribute_values(s.get("attributes")),
+                                "error": s.get("status", {}).get("code") == STATUS_ERROR,
+                                "message": s.get("status", {}).get("message", ""),
+                            })
+    return traces
+
+
+def slowest_traces(traces, limit=10, name=None):
+    """(duration_seconds, trace_id, root, spans) of the slowest traces"""
+    ranked = []
+    for trace_id, spans in traces.items():
+        roots = [s for s in spans if not s["parent_id"]]
+        if not roots or (name and roots[0]["name"] != name):
+            continue
+        root = roots[0]
+        ranked.append(((root["end_ns"] - root["start_ns"]) / 1e9, trace_id, root, spans))
+    ranked.sort(key=lambda item: -item[0])
+    return ranked[:limit]
+
+
+def format_trace(root, spans):
+    """Indented span tree with durations and offsets from the start of the request"""
+    children = {}
+    for s in spans:
+        children.setdefault(s["parent_id"], []).append(s)
+    lines = []
+
+    def walk(node, depth):
+        offset = (node["start_ns"] - root["start_ns"]) / 1e9
+        duration = (node["end_ns"] - node["start_ns"]) / 1e9
+        attrs = " ".join(f"{k}={v}" for k, v in node["attributes"].items())
+        status = f" ❌ {node['message']}" if node["error"] else ""
+        lines.append(f"{'  ' * depth}{node['name']:<{32 - 2 * depth}} +{offset:6.2f}s {duration:7.3f}s  {attrs}{status}")
+        for child in sorted(children.get(node["span_id"], []), key=lambda s: s["start_ns"]):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the slowest request traces")
+    parser.add_argument("--limit", type=int, default=10, help="Number of traces to show")
+    parser.add_argument("--days", type=int, help="Only read the last N days of traces")
+    parser.add_argument("--name", help="Only traces whose root span has this name, e.g. ask_question")
+    parser.add_argument("--dir", default=str(TRACES_DIR), help="Trace directory")
+    args = parser.parse_args()
+
+    traces = load_traces(args.dir, args.days)
+    if not traces:
+        print(f"No traces in {args.dir} (set TRACE_SAMPLE_RATE above 0 to record them)")
+        return
+
+    slowest = slowest_traces(traces, args.limit, args.name)
+    print(f"🐢 {len(slowest)} slowest of {len(traces)} traces\n")
+    for duration, trace_id, root, spans in slowest:
+        started = datetime.fromtimestamp(root["start_ns"] / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{duration:.2f}s  {root['name']}  {started}  trace {trace_id}")
+        print(format_trace(root, spans))
+        print()
+
+    # Where the time went across these traces
+    totals = {}
+    for _, _, root, spans in slowest:
+        for s in spans:
+            if s is root:
+                continue
+            entry = totals.setdefault(s["name"], [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += (s["end_ns"] - s["start_ns"]) / 1e9
+            entry[2] += s["error"]
+    if totals:
+        print("Time by step in these traces:")
+        for step, (count, seconds, errors) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            print(f"  {step:<32} {seconds:8.2f}s  {count:4d} spans  {errors:4d} errors")
+
+
+if __name__ == "__main__":
+    main()
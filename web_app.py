@@ -2,13 +2,19 @@
 import streamlit as st
 import sys
 import os
+import time
+from datetime import datetime
 from pathlib import Path
 
 # Add project modules to path
 sys.path.append(str(Path(__file__).parent))
 
 from modules.free_ai_core import FreeStudentAI
+from modules.metrics import REGISTRY
 from modules.flashcard_generator import FlashcardSystem
+from modules.deck_cache import DeckDataCache
+from modules.review_scheduler import AGAIN, GOOD
+from modules.session_decks import SessionDeck
 
 # Configure the page
 st.set_page_config(
@@ -26,8 +32,43 @@ def load_ai():
 def load_flashcard_system():
     return FlashcardSystem()
 
+@st.cache_resource
+def load_deck_data():
+    # Listings, stats and saved sets are shared read-only by every session
+    # and refreshed only when the flashcard system saves, deletes or imports
+    return DeckDataCache(
+        flashcard_sys,
+        max_decks=int(os.getenv("DECK_CACHE_MAX_DECKS", "32")),
+        max_bytes=int(os.getenv("DECK_CACHE_MAX_MB", "64")) * 1024 * 1024
+    )
+
+def get_session_deck():
+    """This browser session's own deck (other students never see it)"""
+    if "deck" not in st.session_state:
+        st.session_state.deck = SessionDeck(int(os.getenv("SESSION_DECK_MAX_CARDS", "500")))
+    return st.session_state.deck
+
+def reset_quiz():
+    st.session_state.quiz_score = 0
+    st.session_state.quiz_index = 0
+    st.session_state.show_answer = False
+    st.session_state.quiz_complete = False
+    # Due-card queue and the card on screen; rebuilt from review state on the next quiz run
+    st.session_state.quiz_queue = None
+    st.session_state.quiz_total = 0
+    st.session_state.quiz_card = None
+
+def answer_card(card, position, quality):
+    flashcard_sys.record_review(card, position, quality, deck.source)
+    st.session_state.quiz_score += quality == GOOD
+    st.session_state.quiz_index += 1
+    st.session_state.quiz_card = None
+    st.session_state.show_answer = False
+
 ai = load_ai()
 flashcard_sys = load_flashcard_system()
+deck_data = load_deck_data()
+deck = get_session_deck()
 
 # Custom CSS for better appearance
 st.markdown("""
@@ -108,9 +149,6 @@ if menu == "🤖 AI Tutor":
     question = st.text_input("Ask any academic question:", placeholder="e.g., What is photosynthesis?")
     
     if question:
-        with st.spinner("Thinking..."):
-            response = ai.ask_question(question, selected_subject)
-        
         # Display conversation
         col1, col2 = st.columns([1, 4])
         with col1:
@@ -122,7 +160,13 @@ if menu == "🤖 AI Tutor":
         with col1:
             st.image("https://cdn-icons-png.flaticon.com/512/4712/4712035.png", width=50)
         with col2:
-            st.markdown(f'<div class="chat-message bot-message"><b>AI Tutor:</b> {response}</div>', unsafe_allow_html=True)
+            st.markdown("**AI Tutor:**")
+            st.write_stream(ai.ask_question_stream(question, selected_subject))
+            if ai.last_source == "semantic_cache":
+                st.caption(f"⚡ From semantic cache • similar to \"{ai.last_match['question']}\" "
+                           f"(similarity {ai.last_match['score']:.2f})")
+            elif ai.last_source == "cache":
+                st.caption("⚡ From answer cache")
     
     # Example questions
     st.markdown("### 💡 Example Questions")
@@ -141,6 +185,20 @@ if menu == "🤖 AI Tutor":
 elif menu == "📚 Flashcards":
     st.markdown('<h2 class="sub-header">📚 Create Study Flashcards</h2>', unsafe_allow_html=True)
     
+    # Full-text search across every saved set
+    search_query = st.text_input("🔍 Search all flashcards:", placeholder="e.g., photosynthesis")
+    if search_query:
+        start = time.perf_counter()
+        hits = flashcard_sys.search(search_query, limit=20)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        st.caption(f"{len(hits)} matches in {elapsed_ms:.1f} ms")
+        for hit in hits:
+            with st.expander(f"{(hit['question'] or '')[:70]} — {hit['filename']}"):
+                st.write(f"**Question:** {hit['question']}")
+                st.write(f"**Answer:** {hit['answer']}")
+                st.caption(f"Category: {hit['category']} • Card {hit['position'] + 1} of {hit['filename']}")
+        st.markdown("---")
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -150,7 +208,9 @@ elif menu == "📚 Flashcards":
         if st.button("Generate Flashcards", type="primary"):
             if topic:
                 with st.spinner(f"Creating {count} flashcards about {topic}..."):
-                    flashcards = flashcard_sys.generate(topic, count, save=True)
+                    flashcards = flashcard_sys.generate(topic, count, save=True, append=False)
+                deck.add(flashcards)
+                reset_quiz()
                 
                 st.success(f"✅ Generated {len(flashcards)} flashcards!")
                 
@@ -167,7 +227,7 @@ elif menu == "📚 Flashcards":
     with col2:
         # Load existing flashcards
         st.markdown("### 📂 Saved Flashcard Sets")
-        sets = flashcard_sys.list_saved_sets()
+        sets = deck_data.list_sets()
         
         if sets:
             selected_set = st.selectbox(
@@ -178,38 +238,55 @@ elif menu == "📚 Flashcards":
             if st.button("Load Selected Set"):
                 # Extract filename from selection
                 filename = selected_set.split(" (")[0]
-                flashcards = flashcard_sys.load_flashcards(filename)
-                st.session_state.loaded_flashcards = flashcards
-                st.success(f"Loaded {len(flashcards)} flashcards!")
+                flashcards = deck_data.get_deck(filename)
+                if flashcards is not None:
+                    deck.use_set(filename, flashcards)
+                    reset_quiz()
+                    st.success(f"Loaded {len(flashcards)} flashcards!")
+                else:
+                    st.error(f"Could not load {filename}")
         else:
             st.info("No saved flashcard sets yet. Generate some first!")
 
 elif menu == "🎯 Quiz":
     st.markdown('<h2 class="sub-header">🎯 Test Your Knowledge</h2>', unsafe_allow_html=True)
     
-    if 'quiz_score' not in st.session_state:
-        st.session_state.quiz_score = 0
-        st.session_state.quiz_index = 0
-        st.session_state.show_answer = False
-        st.session_state.quiz_complete = False
+    if 'quiz_queue' not in st.session_state:
+        reset_quiz()
     
     # Check if we have flashcards
-    if not flashcard_sys.flashcards:
+    if not deck:
         st.warning("No flashcards available. Generate some in the Flashcards section first!")
         
         # Option to generate quick flashcards
         if st.button("Generate Sample Flashcards"):
             with st.spinner("Creating sample flashcards..."):
-                flashcard_sys.generate("General Knowledge", 5)
+                deck.add(flashcard_sys.generate("General Knowledge", 5, append=False))
+            reset_quiz()
             st.rerun()
     else:
-        total = len(flashcard_sys.flashcards)
+        if st.session_state.quiz_queue is None:
+            st.session_state.quiz_queue = flashcard_sys.scheduler.due_queue(deck.cards, deck.source)
+            st.session_state.quiz_total = st.session_state.quiz_queue.count_due()
+        if st.session_state.quiz_card is None and not st.session_state.quiz_complete:
+            # Next card from the review queue: new cards first, then by due time
+            st.session_state.quiz_card = st.session_state.quiz_queue.pop_due()
+            if st.session_state.quiz_card is None:
+                st.session_state.quiz_complete = True
+        
+        total = st.session_state.quiz_total
         current_idx = st.session_state.quiz_index
         
-        if current_idx < total and not st.session_state.quiz_complete:
-            card = flashcard_sys.flashcards[current_idx]
+        if not total:
+            next_due = st.session_state.quiz_queue.next_due()
+            st.success("✅ Nothing is due for review right now. Come back later!")
+            if next_due:
+                st.caption(f"Next card due {datetime.fromtimestamp(next_due):%Y-%m-%d %H:%M}")
+        elif not st.session_state.quiz_complete:
+            position = st.session_state.quiz_card
+            card = deck[position]
             
-            st.progress((current_idx / total), text=f"Question {current_idx + 1} of {total}")
+            st.progress(min(current_idx / total, 1.0), text=f"Question {current_idx + 1} of {total}")
             
             st.markdown(f"### ❓ Question {current_idx + 1}")
             st.markdown(f"**{card['question']}**")
@@ -226,17 +303,15 @@ elif menu == "🎯 Quiz":
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("✅ I Got It Right!"):
-                        st.session_state.quiz_score += 1
-                        st.session_state.quiz_index += 1
-                        st.session_state.show_answer = False
+                        answer_card(card, position, GOOD)
                         st.rerun()
                 with col2:
                     if st.button("❌ I Was Wrong"):
-                        st.session_state.quiz_index += 1
-                        st.session_state.show_answer = False
+                        answer_card(card, position, AGAIN)
                         st.rerun()
         
-        elif st.session_state.quiz_complete or current_idx >= total:
+        else:
+            total = max(current_idx, 1)
             score = st.session_state.quiz_score
             percentage = (score / total) * 100
             
@@ -252,10 +327,7 @@ elif menu == "🎯 Quiz":
                 st.info("📚 Keep studying! You'll do better next time.")
             
             if st.button("Restart Quiz"):
-                st.session_state.quiz_score = 0
-                st.session_state.quiz_index = 0
-                st.session_state.show_answer = False
-                st.session_state.quiz_complete = False
+                reset_quiz()
                 st.rerun()
 
 elif menu == "📊 Statistics":
@@ -264,16 +336,123 @@ elif menu == "📊 Statistics":
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        sets = flashcard_sys.list_saved_sets()
+        sets = deck_data.list_sets()
         st.metric("Flashcard Sets", len(sets))
     
     with col2:
-        total_cards = sum(s['count'] for s in sets) if sets else 0
-        st.metric("Total Flashcards", total_cards)
+        st.metric("Total Flashcards", deck_data.get_deck_stats()['cards'])
     
+    history = flashcard_sys.history.get_stats()
     with col3:
-        # Mock progress (you can implement real tracking)
-        st.metric("Study Streak", "3 days")
+        st.metric("Study Streak", f"{history['current_streak']} days",
+                  help=f"Longest streak: {history['longest_streak']} days")
+    
+    # Quiz history, read from rollups kept up to date as answers are recorded
+    if history['reviews']:
+        st.markdown("### 📈 Review History")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Cards Reviewed", history['reviews'])
+        with col2:
+            st.metric("Accuracy", f"{history['accuracy'] * 100:.1f}%")
+        with col3:
+            st.metric("Study Days", history['study_days'])
+        st.bar_chart(history['reviews_per_day'])
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**By topic**")
+            for topic, counts in history['topics'].items():
+                st.write(f"{topic}: {counts['accuracy'] * 100:.0f}% of {counts['reviews']}")
+        with col2:
+            st.markdown("**By difficulty**")
+            for difficulty, counts in history['difficulties'].items():
+                st.write(f"{difficulty.title()}: {counts['accuracy'] * 100:.0f}% of {counts['reviews']}")
+    
+    # Response cache effectiveness
+    st.markdown("### ⚡ Answer Cache")
+    cache_stats = ai.cache.get_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Cache Hits", cache_stats['memory_hits'] + cache_stats['disk_hits'])
+    with col2:
+        st.metric("Cache Misses", cache_stats['misses'])
+    with col3:
+        st.metric("Hit Rate", f"{cache_stats['hit_rate'] * 100:.1f}%")
+    with col4:
+        st.metric("Cached Answers", cache_stats['disk_entries'])
+    
+    if ai.semantic_cache is not None:
+        semantic_stats = ai.semantic_cache.get_stats()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Semantic Hits", semantic_stats['hits'])
+        with col2:
+            st.metric("Semantic Hit Rate", f"{semantic_stats['hit_rate'] * 100:.1f}%")
+        with col3:
+            st.metric("Indexed Questions", semantic_stats['entries'])
+    
+    with st.expander("🗂️ Deck Data Cache"):
+        data_stats = deck_data.get_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Listing Hit Rate", f"{data_stats['views']['listing']['hit_rate'] * 100:.0f}%")
+        with col2:
+            st.metric("Stats Hit Rate", f"{data_stats['views']['stats']['hit_rate'] * 100:.0f}%")
+        with col3:
+            st.metric("Deck Hit Rate", f"{data_stats['views']['decks']['hit_rate'] * 100:.0f}%")
+        with col4:
+            st.metric("Cached Decks", data_stats['cached_decks'])
+        st.caption(f"{data_stats['invalidations']} invalidations from saves/deletes/imports • "
+                   f"{data_stats['cached_bytes'] / 1024:.0f} KB cached • {data_stats['evictions']} decks evicted")
+    
+    if "deepseek" in ai.available_services:
+        with st.expander("🌐 DeepSeek Connection Pool"):
+            pool_stats = ai.http.get_stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Requests", pool_stats['requests'])
+            with col2:
+                st.metric("Connection Reuse", f"{pool_stats['connection_reuse_rate'] * 100:.0f}%")
+            with col3:
+                st.metric("Avg Connect", f"{pool_stats['avg_connect_ms']:.0f} ms")
+            with col4:
+                st.metric("Avg Server", f"{pool_stats['avg_server_ms']:.0f} ms")
+            st.caption(f"Retries after 429/5xx or connection errors: {pool_stats['retries']}")
+    
+    with st.expander("📈 AI Metrics"):
+        metrics = ai.get_metrics()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Questions", metrics['questions'])
+        with col2:
+            st.metric("Answered Offline", f"{metrics['offline_rate'] * 100:.0f}%")
+        with col3:
+            st.metric("Avg Fallback Depth", f"{metrics['mean_fallback_depth']:.2f}")
+        
+        if metrics['providers']:
+            st.write("**Providers**")
+            st.table([
+                {
+                    "Provider": name,
+                    "Calls": p['calls'],
+                    "Error Rate": f"{p['error_rate'] * 100:.0f}%",
+                    "Rate Limited": p['rate_limited'],
+                    "p50": f"{p['p50_seconds']:.2f}s",
+                    "p95": f"{p['p95_seconds']:.2f}s",
+                    "Prompt Tokens": p['prompt_tokens'],
+                    "Completion Tokens": p['completion_tokens'],
+                }
+                for name, p in metrics['providers'].items()
+            ])
+        if metrics['answers']:
+            st.write("**Answer latency by source**")
+            st.table([
+                {"Source": source, "Answers": a['count'], "p50": f"{a['p50']:.2f}s", "p95": f"{a['p95']:.2f}s"}
+                for source, a in metrics['answers'].items()
+            ])
+        st.caption("Prometheus format: set METRICS_PORT to serve /metrics")
+        st.download_button("Download metrics", REGISTRY.render(), file_name="metrics.txt")
     
     # Flashcard sets table
     if sets:
@@ -287,8 +466,11 @@ elif menu == "📊 Statistics":
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button(f"Load {s['filename']}", key=f"load_{s['filename']}"):
-                        flashcard_sys.load_flashcards(s['filename'])
-                        st.success(f"Loaded {s['count']} flashcards!")
+                        flashcards = deck_data.get_deck(s['filename'])
+                        if flashcards is not None:
+                            deck.use_set(s['filename'], flashcards)
+                            reset_quiz()
+                            st.success(f"Loaded {s['count']} flashcards!")
                         st.rerun()
                 with col2:
                     if st.button(f"Delete {s['filename']}", key=f"delete_{s['filename']}"):
@@ -332,7 +514,38 @@ elif menu == "⚙️ Settings":
     
     with col2:
         st.write(f"**OS:** {platform.system()} {platform.release()}")
-        st.write(f"**Available AI Services:** {', '.join(ai.available_services) if ai.available_services else 'Local Knowledge Base'}")
+    
+    st.markdown("### 🩺 AI Provider Health")
+    provider_health = ai.health.snapshot()
+    if provider_health:
+        state_icons = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}
+        for provider in provider_health:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.write(f"{state_icons[provider['state']]} **{provider['name'].title()}** ({provider['state'].replace('_', '-')})")
+            with col2:
+                st.write(f"Error rate: {provider['error_rate'] * 100:.0f}%")
+            with col3:
+                st.write(f"Latency p50/p95: {provider['p50_ms']:.0f} / {provider['p95_ms']:.0f} ms")
+            with col4:
+                if provider['state'] == "open":
+                    st.write(f"Retry in {provider['retry_in']:.0f}s")
+                else:
+                    st.write(f"Calls: {provider['total_calls']}")
+            if provider['last_error'] and provider['state'] != "closed":
+                st.caption(f"Last error: {provider['last_error']}")
+            key_usage = ai.key_pools[provider['name']].snapshot()
+            if len(key_usage) > 1:
+                with st.expander(f"🔑 {provider['name'].title()} keys ({len(key_usage)})"):
+                    for key in key_usage:
+                        st.write(f"`{key['key']}` • {key['state']} • {key['requests']} requests, "
+                                 f"{key['failures']} failed • {key['remaining']:.0f} requests of quota left")
+        limiter_stats = ai.rate_limiter.get_stats()
+        st.caption(f"Rate limiter: {limiter_stats['granted']} requests granted, "
+                   f"{limiter_stats['timed_out']} gave up waiting for quota, "
+                   f"{sum(limiter_stats['queued'].values())} waiting now")
+    else:
+        st.write("**Available AI Services:** Local Knowledge Base")
     
     if st.button("Clear Cache & Restart"):
         st.cache_resource.clear()